@@ -1,23 +1,207 @@
+import atexit
+import glob
+import hashlib
 import json
 import os
+import queue
+import re
+import sqlite3
+import threading
+import time
 from datetime import datetime
+import httpx
 from dotenv import load_dotenv
 from groq import Groq
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Load environment variables
 load_dotenv()
 
+# Cheap fast-path patterns tried before falling back to LLM extraction
+_ID_RE = re.compile(r"\bFB\d{15}\b", re.IGNORECASE)
+_PHONE_RE = re.compile(r"(?<!\w)\+?\d[\d\-\s]{7,}\d")
+# A handle's @ must not follow a word character or dot, and emails are
+# blanked out first, so "jane@example.com" never reads as "@example.com"
+_USER_RE = re.compile(r"(?<![\w.])@[A-Za-z0-9_.]{3,}")
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+# facebook_database.json stays the store of record (the solution agent reads
+# it); verification queries an indexed SQLite copy, rebuilt when the file changes
+CUSTOMER_SEED_PATH = "facebook_database.json"
+CUSTOMER_DB_PATH = "facebook.db"
+_CUSTOMER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id TEXT PRIMARY KEY COLLATE NOCASE,
+    username_lc TEXT NOT NULL,
+    phone_norm TEXT NOT NULL,
+    data JSON NOT NULL
+);
+CREATE INDEX IF NOT EXISTS customers_username ON customers (username_lc);
+CREATE INDEX IF NOT EXISTS customers_phone ON customers (phone_norm);
+CREATE TABLE IF NOT EXISTS store_state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+# Append-only complaint log, folded into the customer records at load time;
+# once a load replays this many bytes of it, it is compacted into the database
+COMPLAINT_LOG_PATH = "facebook_complaints.jsonl"
+COMPLAINT_LOG_COMPACT_BYTES = 256 * 1024
+
+# While it is folded into the database the log is moved aside under a unique
+# name, which the database then records; a crash mid-compaction is finished
+# on the next start without folding any complaint twice
+COMPACTING_LOG_PREFIX = f"{COMPLAINT_LOG_PATH}.compacting-"
+
+_NON_DIGIT_RE = re.compile(r"\D")
+
+def _phone_key(phone):
+    """Digits of a phone number, so separators never affect a lookup"""
+    return _NON_DIGIT_RE.sub("", phone or "")
+
+# One pooled keep-alive client shared by every agent in the process
+_GROQ_CLIENT = None
+_GROQ_CLIENT_LOCK = threading.Lock()
+
+def _shared_groq_client(api_key):
+    """Return the process-wide Groq client, creating it on first use"""
+    global _GROQ_CLIENT
+    with _GROQ_CLIENT_LOCK:
+        if _GROQ_CLIENT is None:
+            limits = httpx.Limits(max_keepalive_connections=32, keepalive_expiry=120)
+            try:
+                http_client = httpx.Client(http2=True, limits=limits)
+            except ImportError:
+                # HTTP/2 needs the optional h2 package; keep-alive still applies
+                http_client = httpx.Client(limits=limits)
+            _GROQ_CLIENT = Groq(api_key=api_key, http_client=http_client)
+        return _GROQ_CLIENT
+
+def _parse_llm_json(content):
+    """Parse the JSON object in an LLM reply, ignoring whitespace or code fences around it"""
+    start = content.find("{")
+    end = content.rfind("}")
+    if start != -1 and end > start:
+        content = content[start:end + 1]
+    if ORJSON_AVAILABLE:
+        return orjson.loads(content)
+    return json.loads(content)
+
+# Background writer keeps disk I/O off the conversation latency path; one
+# queue and thread serve every agent in the process
+_io_queue = queue.Queue()
+
+def _io_writer():
+    """Drain queued (path, bytes, append) writes; full writes replace the file atomically"""
+    while True:
+        path, data, append = _io_queue.get()
+        try:
+            if append:
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                try:
+                    os.write(fd, data)
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            else:
+                tmp_path = f"{path}.tmp"
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                try:
+                    os.write(fd, data)
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Background write failed for {path}: {e}")
+        finally:
+            _io_queue.task_done()
+
+threading.Thread(target=_io_writer, daemon=True, name="facebook-io").start()
+atexit.register(_io_queue.join)
+
+def _decode_complaint(line):
+    """Decode one complaint log line, or None (with a warning) if it is unreadable"""
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        entry = None
+    if isinstance(entry, dict) and isinstance(entry.get("customer_id"), str) and "complaint" in entry:
+        return entry
+    print(f"⚠️ Skipping unreadable complaint log line: {line[:80]!r}")
+    return None
+
+def _write_json(path, data):
+    """Serialize now and hand the bytes to the background writer"""
+    payload = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    _io_queue.put((path, payload, False))
+
+def _append_jsonl(path, record):
+    """Queue a single JSON line to be appended to path"""
+    payload = (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+    _io_queue.put((path, payload, True))
+
+# Invariant system instructions - kept byte-identical across calls so the
+# provider can reuse the cached prompt prefix; only the user turn varies
+_VERIFY_SYS = """You are an extraction engine for Facebook customer verification.
+Extract customer verification information from the customer's response.
+
+Look for:
+- Customer ID (format: FB followed by 15 digits, e.g., FB001234567890123)
+- Phone number (various formats like +1-555-0123, 555-0123, etc.)
+- Username (format: @username or just username)
+
+Return as JSON:
+{
+    "customer_id": "customer ID if found or null",
+    "phone": "phone number if found or null",
+    "username": "username if found (with @ if provided) or null"
+}"""
+
+_EXTRACT_SYS = """You are an extraction engine for Facebook customer support.
+Extract customer information and emotional state from the conversation exchange.
+
+Extract any new/updated information and return as JSON:
+{
+    "customer_name": "name or null",
+    "problem_description": "problem description or null",
+    "problem_category": "account/privacy/content/ads/technical/harassment/other or null",
+    "urgency_level": "low/medium/high/critical or null",
+    "content_id": "post ID/ad ID/page ID or null",
+    "account_issue": "account issue type or null",
+    "customer_emotion": "angry/frustrated/disappointed/worried/calm/satisfied/neutral or null",
+    "emotion_intensity": "low/medium/high or null",
+    "emotion_keywords": ["list of emotional words/phrases found in response"]
+}"""
+
+_QUESTION_SYS = """You are a Facebook customer service representative. Generate the next most important question with empathetic social media support tone.
+
+IMPORTANT:
+- Use supportive, understanding tone typical of social media support
+- Be extra careful with privacy and content-related issues
+- Reference their account type (business/creator/personal) and verification status if relevant
+- Adapt tone based on emotion (extra supportive if frustrated about content removal)
+
+Generate a natural, empathetic question (max 30 words) that gets the most critical missing information.
+
+Return only the question, nothing else."""
+
 class FacebookCustomerServiceAgent:
     def __init__(self):
         # Initialize Groq
         groq_api_key = os.getenv("GROQ_API_KEY")
         if groq_api_key:
-            self.client = Groq(api_key=groq_api_key)
+            self.client = _shared_groq_client(groq_api_key)
         else:
             raise Exception("GROQ_API_KEY not found")
         
-        # Load customer database
-        self.customer_db = self.load_customer_database()
+        # Open the customer store
+        self.db_conn = self.open_customer_store()
+        if self._complaint_log_replayed >= COMPLAINT_LOG_COMPACT_BYTES:
+            self.compact_complaint_log()
         
         # Conversation state
         self.conversation_history = []
@@ -26,31 +210,206 @@ class FacebookCustomerServiceAgent:
         self.is_fraud_call = False
         self.question_count = 0
         self.max_questions = 3
+        self.history_window = 4
         self.customer_emotions = []
+        
+        # Exact-match cache of extraction completions for this session
+        self._llm_exact_cache = {}
+    
+    def open_customer_store(self):
+        """Open the SQLite customer store and bring it up to date"""
+        conn = sqlite3.connect(CUSTOMER_DB_PATH)
+        conn.executescript(_CUSTOMER_SCHEMA)
+        for path in sorted(glob.glob(f"{glob.escape(COMPACTING_LOG_PREFIX)}*")):
+            self._fold_compacting_log(path)
+        self._sync_store(conn)
+        return conn
+    
+    def _sync_store(self, conn):
+        """Rebuild the store if facebook_database.json changed, then replay new log lines
+        
+        Unchanged databases cost one stat and a read of the log tail, so
+        start-up no longer grows with the number of customers.
+        """
+        # Let complaints still queued by other agents in this process land first
+        _io_queue.join()
+        state = dict(conn.execute("SELECT key, value FROM store_state"))
+        try:
+            stat = os.stat(CUSTOMER_SEED_PATH)
+            seed = f"{stat.st_mtime_ns}:{stat.st_size}"
+        except FileNotFoundError:
+            seed = ""
+        try:
+            log_size = os.path.getsize(COMPLAINT_LOG_PATH)
+        except FileNotFoundError:
+            log_size = 0
+        offset = int(state.get("log_offset", 0))
+        
+        with conn:
+            if state.get("seed") != seed or log_size < offset:
+                self._load_seed(conn)
+                offset = 0
+            offset = self._replay_complaint_log(conn, offset)
+            conn.executemany(
+                "INSERT OR REPLACE INTO store_state (key, value) VALUES (?, ?)",
+                [("seed", seed), ("log_offset", str(offset))]
+            )
+        self._complaint_log_replayed = offset
     
-    def load_customer_database(self):
-        """Load customer database from JSON file"""
+    @staticmethod
+    def _load_seed(conn):
+        """Replace the stored customers with those in facebook_database.json"""
         try:
-            with open("facebook_database.json", 'r', encoding='utf-8') as f:
-                return json.load(f)
+            # json.loads takes the raw bytes, skipping the text-mode decode layer
+            with open(CUSTOMER_SEED_PATH, 'rb') as f:
+                raw = f.read()
         except FileNotFoundError:
+            raw = b""
+        if raw.strip():
+            customers = json.loads(raw)["customers"]
+        else:
             print("⚠️ Facebook customer database not found. Creating empty database.")
-            return {"customers": []}
+            customers = []
+        
+        conn.execute("DELETE FROM customers")
+        # The first record wins on duplicate IDs, as the JSON list order implies
+        conn.executemany(
+            "INSERT OR IGNORE INTO customers (customer_id, username_lc, phone_norm, data) VALUES (?, ?, ?, ?)",
+            [(c["customer_id"], c["username"].lower(), _phone_key(c["phone"]), json.dumps(c, ensure_ascii=False))
+             for c in customers]
+        )
+    
+    @staticmethod
+    def _replay_complaint_log(conn, offset):
+        """Apply complaint log lines past offset to the store; returns the new offset"""
+        try:
+            with open(COMPLAINT_LOG_PATH, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Torn final append from a crash: cut it off so the
+                        # next append starts on a clean line
+                        print(f"⚠️ Dropping incomplete last line of {COMPLAINT_LOG_PATH}")
+                        os.truncate(COMPLAINT_LOG_PATH, offset)
+                        break
+                    offset += len(line)
+                    entry = _decode_complaint(line)
+                    if entry is not None:
+                        conn.execute(
+                            "UPDATE customers SET data = json_insert(data, '$.previous_complaints[#]', json(?)) "
+                            "WHERE customer_id = ?",
+                            (json.dumps(entry["complaint"], ensure_ascii=False), entry["customer_id"])
+                        )
+            return offset
+        except FileNotFoundError:
+            return 0
+    
+    def compact_complaint_log(self):
+        """Fold the complaint log into facebook_database.json and start a fresh log"""
+        _io_queue.join()
+        compacting_path = f"{COMPACTING_LOG_PREFIX}{time.time_ns()}"
+        try:
+            # Appends made from here on go to a new log
+            os.replace(COMPLAINT_LOG_PATH, compacting_path)
+        except OSError as e:
+            print(f"⚠️ Complaint log compaction failed: {e}")
+            return
+        self._fold_compacting_log(compacting_path)
+        
+        # The database file changed, so the store is rebuilt from it
+        self._sync_store(self.db_conn)
+    
+    @staticmethod
+    def _fold_compacting_log(path):
+        """Fold a moved-aside log into facebook_database.json, then delete it
+        
+        The database is rewritten with the log's name before the log is
+        deleted; if that name is already there, an earlier run crashed after
+        folding it and the log is only deleted.
+        """
+        name = os.path.basename(path)
+        try:
+            with open(path, 'rb') as f:
+                folded = f.read()
+            
+            try:
+                with open(CUSTOMER_SEED_PATH, 'rb') as f:
+                    raw = f.read()
+            except FileNotFoundError:
+                raw = b""
+            customer_db = json.loads(raw) if raw.strip() else {"customers": []}
+            
+            if customer_db.get("compacted_log") != name:
+                by_id = {}
+                for customer in customer_db["customers"]:
+                    by_id.setdefault(customer["customer_id"].lower(), customer)
+                for line in folded.splitlines():
+                    entry = _decode_complaint(line)
+                    customer = by_id.get(entry["customer_id"].lower()) if entry else None
+                    if customer is not None:
+                        customer["previous_complaints"].append(entry["complaint"])
+                customer_db["compacted_log"] = name
+                
+                # Written here rather than queued: the log may only go once
+                # the database file is known to hold its complaints
+                payload = json.dumps(customer_db, indent=2, ensure_ascii=False).encode('utf-8')
+                with open(f"{CUSTOMER_SEED_PATH}.tmp", 'wb') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(f"{CUSTOMER_SEED_PATH}.tmp", CUSTOMER_SEED_PATH)
+            
+            os.remove(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Complaint log compaction failed: {e}")
+    
+    def _select_customer(self, where, value):
+        """First stored customer matching a WHERE clause, or None"""
+        row = self.db_conn.execute(
+            f"SELECT data FROM customers WHERE {where} ORDER BY rowid LIMIT 1", (value,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
     
     def verify_customer(self, customer_id=None, phone=None, username=None):
         """Verify customer against database"""
-        for customer in self.customer_db["customers"]:
-            # Check by customer ID
-            if customer_id and customer["customer_id"].lower() == customer_id.lower():
-                return customer
-            # Check by phone number
-            if phone and customer["phone"] in [phone, phone.replace("-", ""), phone.replace(" ", "")]:
+        # Check by customer ID
+        if customer_id:
+            customer = self._select_customer("customer_id = ?", customer_id)
+            if customer is not None:
                 return customer
-            # Check by username
-            if username and customer["username"].lower() == username.lower():
+        # Check by phone number
+        if _phone_key(phone):
+            customer = self._select_customer("phone_norm = ?", _phone_key(phone))
+            if customer is not None:
                 return customer
+        # Check by username
+        if username:
+            return self._select_customer("username_lc = ?", username.lower())
         return None
     
+    def _cached_completion(self, system_prompt, user_prompt, temperature, max_tokens):
+        """Return a JSON-mode completion, reusing an identical earlier call's result"""
+        key = hashlib.blake2b(
+            f"{system_prompt}\x00{user_prompt}\x00{temperature}\x00{max_tokens}".encode('utf-8'),
+            digest_size=16
+        ).digest()
+        if key in self._llm_exact_cache:
+            return self._llm_exact_cache[key]
+        
+        response = self.client.chat.completions.create(
+            model="llama-3.1-8b-instant",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"}
+        )
+        content = response.choices[0].message.content
+        self._llm_exact_cache[key] = content
+        return content
+    
     def speak(self, text):
         """Display agent response"""
         print(f"📘 Facebook Support: {text}")
@@ -63,37 +422,24 @@ class FacebookCustomerServiceAgent:
     
     def extract_customer_verification_info(self, response):
         """Extract customer ID, phone number, or username for verification"""
-        extraction_prompt = f"""
-        Extract customer verification information from this response:
-        "{response}"
-        
-        Look for:
-        - Customer ID (format: FB followed by 15 digits, e.g., FB001234567890123)
-        - Phone number (various formats like +1-555-0123, 555-0123, etc.)
-        - Username (format: @username or just username)
-        
-        Return as JSON:
-        {{
-            "customer_id": "customer ID if found or null",
-            "phone": "phone number if found or null",
-            "username": "username if found (with @ if provided) or null"
-        }}
-        
-        Return only the JSON, nothing else.
-        """
+        # Clean IDs/phones/handles don't need an LLM round-trip
+        id_match = _ID_RE.search(response)
+        phone_match = _PHONE_RE.search(response)
+        user_match = _USER_RE.search(_EMAIL_RE.sub(" ", response))
+        if id_match or phone_match or user_match:
+            return {
+                "customer_id": id_match.group().upper() if id_match else None,
+                "phone": phone_match.group() if phone_match else None,
+                "username": user_match.group().rstrip(".") if user_match else None
+            }
+        
+        extraction_prompt = f'Customer response: "{response}"'
         
         try:
-            response = self.client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[
-                    {"role": "user", "content": extraction_prompt}
-                ],
-                temperature=0.1,
-                max_tokens=200
-            )
+            content = self._cached_completion(_VERIFY_SYS, extraction_prompt, 0.1, 120)
             
             # Parse JSON response
-            verification_data = json.loads(response.choices[0].message.content.strip())
+            verification_data = _parse_llm_json(content)
             return verification_data
             
         except Exception as e:
@@ -102,42 +448,17 @@ class FacebookCustomerServiceAgent:
     
     def extract_info(self, question, response):
         """Extract information and emotion from customer response"""
-        extraction_prompt = f"""
-        Extract customer information and emotional state from this conversation exchange:
-        
-        Agent Question: {question}
-        Customer Response: {response}
-        
-        Current customer data: {json.dumps(self.customer_data)}
-        
-        Extract any new/updated information and return as JSON:
-        {{
-            "customer_name": "name or null",
-            "problem_description": "problem description or null",
-            "problem_category": "account/privacy/content/ads/technical/harassment/other or null",
-            "urgency_level": "low/medium/high/critical or null",
-            "content_id": "post ID/ad ID/page ID or null",
-            "account_issue": "account issue type or null",
-            "customer_emotion": "angry/frustrated/disappointed/worried/calm/satisfied/neutral or null",
-            "emotion_intensity": "low/medium/high or null",
-            "emotion_keywords": ["list of emotional words/phrases found in response"]
-        }}
-        
-        Return only the JSON, nothing else.
-        """
+        extraction_prompt = (
+            f"Agent Question: {question}\n"
+            f"Customer Response: {response}\n"
+            f"Current customer data: {json.dumps(self.customer_data)}"
+        )
         
         try:
-            response = self.client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[
-                    {"role": "user", "content": extraction_prompt}
-                ],
-                temperature=0.1,
-                max_tokens=300
-            )
+            content = self._cached_completion(_EXTRACT_SYS, extraction_prompt, 0.1, 180)
             
             # Parse and update customer data
-            extracted_data = json.loads(response.choices[0].message.content.strip())
+            extracted_data = _parse_llm_json(content)
             
             # Update customer data with non-null values
             for key, value in extracted_data.items():
@@ -185,8 +506,9 @@ class FacebookCustomerServiceAgent:
         if not self.customer_data.get("content_id") and not self.customer_data.get("account_issue"):
             missing_info.append("specific content ID or account issue details")
         
+        # Only the most recent turns go into the prompt so its size stays flat
         conversation_text = ""
-        for msg in self.conversation_history:
+        for msg in self.conversation_history[-self.history_window:]:
             conversation_text += f"{msg['role']}: {msg['message']}\\n"
         
         # Analyze current emotional state
@@ -204,8 +526,6 @@ class FacebookCustomerServiceAgent:
             """
         
         question_prompt = f"""
-        You are a Facebook customer service representative. Generate the next most important question with empathetic social media support tone.
-        
         Conversation so far:
         {conversation_text}
         
@@ -215,26 +535,18 @@ class FacebookCustomerServiceAgent:
         Question {self.question_count + 1} of {self.max_questions}
         
         {emotion_context}
-        
-        IMPORTANT: 
-        - Use supportive, understanding tone typical of social media support
-        - Be extra careful with privacy and content-related issues
-        - Reference their account type (business/creator/personal) and verification status if relevant
-        - Adapt tone based on emotion (extra supportive if frustrated about content removal)
-        
-        Generate a natural, empathetic question (max 30 words) that gets the most critical missing information.
-        
-        Return only the question, nothing else.
         """
         
         try:
             response = self.client.chat.completions.create(
                 model="llama-3.1-8b-instant",
                 messages=[
+                    {"role": "system", "content": _QUESTION_SYS},
                     {"role": "user", "content": question_prompt}
                 ],
                 temperature=0.7,
-                max_tokens=100
+                max_tokens=100,
+                stop=["\n\n"]
             )
             return response.choices[0].message.content.strip()
         except Exception as e:
@@ -293,7 +605,7 @@ class FacebookCustomerServiceAgent:
             self.conversation_history.append({"role": "agent", "message": fraud_msg})
             
             # End conversation for fraud
-            return self.create_final_output()
+            return self.create_final_output(datetime.now())
         
         # Continue with normal conversation flow
         while self.question_count < self.max_questions:
@@ -328,43 +640,46 @@ class FacebookCustomerServiceAgent:
         self.speak(final_message)
         self.conversation_history.append({"role": "agent", "message": final_message})
         
+        # One timestamp for every record written at conversation end
+        end_ts = datetime.now()
+        
         # Update customer record
-        self.update_customer_record()
+        self.update_customer_record(end_ts)
         
         # Save conversation
-        self.save_conversation()
+        self.save_conversation(end_ts)
         
-        return self.create_final_output()
+        return self.create_final_output(end_ts)
     
-    def update_customer_record(self):
+    def update_customer_record(self, end_ts=None):
         """Simulate updating customer record with new complaint"""
         if self.verified_customer and not self.is_fraud_call:
+            end_ts = end_ts or datetime.now()
             new_complaint = {
-                "date": datetime.now().strftime("%Y-%m-%d"),
+                "date": end_ts.strftime("%Y-%m-%d"),
                 "issue": self.customer_data.get("problem_description", "General account issue"),
                 "resolution": "Under review"
             }
             
-            # Find and update customer in database
-            for i, customer in enumerate(self.customer_db["customers"]):
-                if customer["customer_id"] == self.verified_customer["customer_id"]:
-                    self.customer_db["customers"][i]["previous_complaints"].append(new_complaint)
-                    break
-            
-            # Save updated database
-            with open("facebook_database.json", 'w', encoding='utf-8') as f:
-                json.dump(self.customer_db, f, indent=2, ensure_ascii=False)
+            # The store picks the complaint up from the log on its next sync;
+            # compact_complaint_log() later folds it into the database file
+            self.verified_customer["previous_complaints"].append(new_complaint)
+            _append_jsonl(COMPLAINT_LOG_PATH, {
+                "customer_id": self.verified_customer["customer_id"],
+                "complaint": new_complaint
+            })
             
             print(f"📝 Facebook customer record updated with new complaint")
     
-    def save_conversation(self):
+    def save_conversation(self, end_ts=None):
         """Save the conversation to file"""
+        end_ts = end_ts or datetime.now()
         os.makedirs("conversations", exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = end_ts.strftime("%Y%m%d_%H%M%S")
         filename = f"conversations/facebook_conversation_{timestamp}.json"
         
         conversation_data = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": end_ts.isoformat(),
             "customer_verified": self.verified_customer is not None,
             "is_fraud_call": self.is_fraud_call,
             "verified_customer_info": self.verified_customer,
@@ -374,15 +689,15 @@ class FacebookCustomerServiceAgent:
             "total_questions": self.question_count
         }
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(conversation_data, f, indent=2, ensure_ascii=False)
+        _write_json(filename, conversation_data)
         
         print(f"💾 Facebook conversation saved: {filename}")
     
-    def create_final_output(self):
+    def create_final_output(self, end_ts=None):
         """Create structured final output - only final state"""
+        end_ts = end_ts or datetime.now()
         output_data = {
-            "conversation_completed": datetime.now().isoformat(),
+            "conversation_completed": end_ts.isoformat(),
             "customer_verified": self.verified_customer is not None,
             "is_fraud_call": self.is_fraud_call,
             "customer_name": self.customer_data.get("customer_name"),
@@ -400,17 +715,17 @@ class FacebookCustomerServiceAgent:
         }
         
         # Save output to file
-        self.save_output(output_data)
+        self.save_output(output_data, end_ts)
         return output_data
     
-    def save_output(self, output_data):
+    def save_output(self, output_data, end_ts=None):
         """Save the final output to a JSON file in the output folder"""
+        end_ts = end_ts or datetime.now()
         os.makedirs("output", exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = end_ts.strftime("%Y%m%d_%H%M%S")
         filename = f"output/facebook_complaint_{timestamp}.json"
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, indent=2, ensure_ascii=False)
+        _write_json(filename, output_data)
         
         print(f"💾 Facebook final output saved: {filename}")
 
@@ -1,45 +1,388 @@
+import asyncio
+import atexit
+import hashlib
 import json
 import os
-from datetime import datetime
+import re
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import cached_property
 from dotenv import load_dotenv
-from groq import Groq
+from groq import AsyncGroq
+
+# Optional: faster JSON encode/decode (stdlib json is used when missing)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional: Aho-Corasick keyword automaton (a compiled regex is used when missing)
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Optional: semantic response cache (needs numpy + sentence-transformers)
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    SEMANTIC_CACHE_AVAILABLE = True
+except ImportError:
+    SEMANTIC_CACHE_AVAILABLE = False
 
 # Load environment variables
 load_dotenv()
 
+def _json_loads(data):
+    """Decode JSON text or bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _json_dumps(obj, indent=False, sort_keys=False):
+    """Encode obj as UTF-8 JSON text, minified unless pretty-printed with 2 spaces"""
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, option=option).decode('utf-8')
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False, sort_keys=sort_keys)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, sort_keys=sort_keys)
+
+# Rule-based fast path for verification details, tried before any LLM call
+CUSTOMER_ID_RE = re.compile(r"FKT\d{9,}", re.IGNORECASE)
+PHONE_RE = re.compile(r"(?<!\w)(?:\+?91[-\s]?)?[6-9]\d{4}[-\s]?\d{5}")
+
+def match_verification_info(response):
+    """Return customer ID/phone found by regex, or None when neither matches"""
+    cid = CUSTOMER_ID_RE.search(response)
+    ph = PHONE_RE.search(response)
+    if not (cid or ph):
+        return None
+    return {
+        "customer_id": cid.group().upper() if cid else None,
+        "phone": ph.group() if ph else None
+    }
+
+# Emotion lexicon scanned locally so the LLM no longer has to list keywords
+EMOTION_LEXICON = {
+    "angry": "angry", "furious": "angry", "outraged": "angry", "livid": "angry",
+    "ridiculous": "angry", "unacceptable": "angry", "gussa": "angry",
+    "frustrated": "frustrated", "frustrating": "frustrated", "annoyed": "frustrated",
+    "fed up": "frustrated", "again and again": "frustrated", "still waiting": "frustrated",
+    "pareshan": "frustrated",
+    "disappointed": "disappointed", "disappointing": "disappointed", "let down": "disappointed",
+    "upset": "disappointed", "expected better": "disappointed",
+    "worried": "worried", "concerned": "worried", "anxious": "worried", "scared": "worried",
+    "urgent": "worried", "tension": "worried",
+    "calm": "calm", "no problem": "calm", "okay": "calm",
+    "thank you": "satisfied", "thanks": "satisfied", "happy": "satisfied",
+    "great": "satisfied", "dhanyavaad": "satisfied", "shukriya": "satisfied",
+}
+
+if AHOCORASICK_AVAILABLE:
+    _EMOTION_AUTOMATON = ahocorasick.Automaton()
+    for _word, _emotion in EMOTION_LEXICON.items():
+        _EMOTION_AUTOMATON.add_word(_word, (_word, _emotion))
+    _EMOTION_AUTOMATON.make_automaton()
+else:
+    _EMOTION_RE = re.compile(
+        r"\b(" + "|".join(re.escape(w) for w in sorted(EMOTION_LEXICON, key=len, reverse=True)) + r")\b"
+    )
+
+def scan_emotion_keywords(text):
+    """Return (keyword, emotion) pairs for lexicon words found in text, in one pass"""
+    text = text.lower()
+    if not AHOCORASICK_AVAILABLE:
+        return [(m.group(1), EMOTION_LEXICON[m.group(1)]) for m in _EMOTION_RE.finditer(text)]
+    
+    hits = []
+    for end, (word, emotion) in _EMOTION_AUTOMATON.iter(text):
+        start = end - len(word) + 1
+        # Whole-word matches only ("mad" must not match "made")
+        if (start == 0 or not text[start - 1].isalnum()) and (end + 1 == len(text) or not text[end + 1].isalnum()):
+            hits.append((word, emotion))
+    return hits
+
+# Dump the full customer record after every turn only when FLIPKART_DEBUG=1
+DEBUG = os.environ.get("FLIPKART_DEBUG") == "1"
+
+# Customer store: SQLite table seeded from the JSON export on first use
+CUSTOMER_DB_PATH = "flipkart.db"
+CUSTOMER_SEED_PATH = "flipkart_database.json"
+
+# On-disk cache of LLM responses keyed by model, temperature and prompt
+LLM_CACHE_DIR = "cache"
+LLM_CACHE_TTL = timedelta(days=7)
+
+# Single background writer for end-of-conversation files, shared by all
+# agents in the process and drained before the interpreter exits
+_IO_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="flipkart-io")
+atexit.register(_IO_EXECUTOR.shutdown, wait=True)
+
+def _write_text(path, text, mode='w'):
+    """Write text to path; runs on the background writer"""
+    with open(path, mode, encoding='utf-8') as f:
+        f.write(text)
+
+# Only the latest emotion is read, so keep just a short recent window
+EMOTION_HISTORY_LIMIT = 5
+
+# Fields tied to one customer's identity: never replayed from a similar
+# response, and left out of the context a cached extraction must match
+SEMANTIC_CACHE_EXCLUDED_FIELDS = ("customer_name", "order_id", "company_name", "customer_phone", "customer_email")
+
+# Invariant instructions sent as the system message; only the user turn
+# varies between calls, so the provider can reuse the cached prefix
+VERIFY_SYS_PROMPT = """Extract customer verification information from the customer's response.
+
+Look for:
+- Customer ID (format: FKT followed by numbers, e.g., FKT001234567)
+- Phone number (Indian format like +91-98765-43210, 9876543210, etc.)
+
+Return as JSON:
+{
+    "customer_id": "customer ID if found or null",
+    "phone": "phone number if found or null"
+}"""
+
+EXTRACT_SYS_PROMPT = """Extract customer information and emotional state from the conversation exchange.
+
+Extract any new/updated information and return as JSON:
+{
+    "customer_name": "name or null",
+    "problem_description": "problem description or null",
+    "problem_category": "category or null",
+    "urgency_level": "low/medium/high/critical or null",
+    "order_id": "order ID or null",
+    "product_name": "product or null",
+    "customer_emotion": "angry/frustrated/disappointed/worried/calm/satisfied/neutral or null",
+    "emotion_intensity": "low/medium/high or null"
+}"""
+
+COMBINED_SYS_PROMPT = """Extract customer verification details and any issue information from the customer's response.
+
+Look for:
+- Customer ID (format: FKT followed by numbers, e.g., FKT001234567)
+- Phone number (Indian format like +91-98765-43210, 9876543210, etc.)
+- Any problem, order or product details and the customer's emotional state
+
+Return a single JSON object:
+{
+    "verification": {
+        "customer_id": "customer ID if found or null",
+        "phone": "phone number if found or null"
+    },
+    "info": {
+        "problem_description": "problem description or null",
+        "problem_category": "category or null",
+        "urgency_level": "low/medium/high/critical or null",
+        "order_id": "order ID or null",
+        "product_name": "product or null",
+        "customer_emotion": "angry/frustrated/disappointed/worried/calm/satisfied/neutral or null",
+        "emotion_intensity": "low/medium/high or null"
+    }
+}"""
+
+QUESTION_SYS_PROMPT = """You are a Flipkart customer service representative. Generate the next most important question with Indian customer service tone.
+
+IMPORTANT:
+- Use friendly, respectful Indian customer service tone
+- Be extra helpful to Flipkart Plus members
+- Reference their order history or previous complaints if relevant
+- Adapt tone based on emotion (extra empathetic if frustrated)
+
+Generate a natural, empathetic question (max 30 words) that gets the most critical missing information.
+
+Return only the question, nothing else."""
+
+# Asked when question generation fails, indexed by question number
+FALLBACK_QUESTIONS = [
+    "Can you please provide more details about the issue with your Flipkart order?",
+    "What specific problem are you facing with your product or delivery?",
+    "How would you like us to resolve this issue for you today?"
+]
+
+class EmbeddingCache:
+    """Nearest-neighbour cache of parsed LLM results keyed by text embeddings
+    
+    Each result is stored with a context key and only replayed for the same
+    context, so a similar reply never borrows details from a conversation in
+    a different state. Vectors are kept as raw float32 rows and entries as
+    JSON lines; both files are append-only, so adding an entry writes one
+    row rather than the cache.
+    """
+    
+    _model = None
+    
+    def __init__(self, name, threshold=0.92, model_name="all-MiniLM-L6-v2"):
+        self.threshold = threshold
+        self.model_name = model_name
+        self.vectors_path = os.path.join(LLM_CACHE_DIR, f"semantic_{name}.f32")
+        self.entries_path = os.path.join(LLM_CACHE_DIR, f"semantic_{name}.jsonl")
+        self.vectors = None
+        self.entries = []
+        self._rows_by_context = {}
+        
+        try:
+            with open(self.entries_path, 'r', encoding='utf-8') as f:
+                self.entries = [_json_loads(line) for line in f]
+            if not all(isinstance(entry, dict) and "context" in entry for entry in self.entries):
+                raise ValueError("semantic cache entries predate context keys")
+            # One row per entry; a partial or missing row means the files are out of sync
+            with open(self.vectors_path, 'rb') as f:
+                self.vectors = np.frombuffer(f.read(), dtype=np.float32).reshape(len(self.entries), -1)
+        except (FileNotFoundError, ValueError):
+            self.vectors = None
+            self.entries = []
+        
+        for row, entry in enumerate(self.entries):
+            self._rows_by_context.setdefault(entry["context"], []).append(row)
+        
+        if not self.entries:
+            # Start both files afresh so later appends stay row-aligned
+            self.vectors = None
+            for path in (self.vectors_path, self.entries_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+    
+    def embed(self, text):
+        """Return the L2-normalized embedding of text"""
+        if EmbeddingCache._model is None:
+            EmbeddingCache._model = SentenceTransformer(self.model_name)
+        return EmbeddingCache._model.encode([text], normalize_embeddings=True)[0].astype(np.float32)
+    
+    def lookup(self, vector, context):
+        """Return the result for context most similar to vector, or None below threshold"""
+        rows = self._rows_by_context.get(context)
+        if not rows:
+            return None
+        sims = self.vectors[rows] @ vector
+        best = int(np.argmax(sims))
+        if sims[best] > self.threshold:
+            return self.entries[rows[best]]["result"]
+        return None
+    
+    def add(self, vector, context, result):
+        """Store result under vector and context, and queue one row for each cache file"""
+        entry = {"context": context, "result": result}
+        self._rows_by_context.setdefault(context, []).append(len(self.entries))
+        self.vectors = vector[None, :] if self.vectors is None else np.vstack([self.vectors, vector])
+        self.entries.append(entry)
+        _IO_EXECUTOR.submit(self._append, vector.tobytes(), _json_dumps(entry) + "\n")
+    
+    def _append(self, row, line):
+        """Append one vector row and its result line; runs on the background writer"""
+        try:
+            os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+            with open(self.vectors_path, 'ab') as f:
+                f.write(row)
+            _write_text(self.entries_path, line, mode='a')
+        except OSError as e:
+            print(f"⚠️ Semantic cache write failed: {e}")
+
 class FlipkartCustomerServiceAgent:
-    def __init__(self):
-        # Initialize Groq
+    # Seed file mtime already synced into the store by any instance in this process
+    _seed_mtime = None
+    
+    def __init__(self, script=None, client=None):
+        # Initialize Groq, reusing the caller's client when batching
         groq_api_key = os.getenv("GROQ_API_KEY")
-        if groq_api_key:
-            self.client = Groq(api_key=groq_api_key)
+        if client is not None:
+            self.client = client
+        elif groq_api_key:
+            self.client = AsyncGroq(api_key=groq_api_key)
         else:
             raise Exception("GROQ_API_KEY not found")
         
-        # Load customer database
-        self.customer_db = self.load_customer_database()
-        
         # Conversation state
         self.conversation_history = []
+        self._history_messages = []
         self.customer_data = {}
         self.verified_customer = None
         self.is_fraud_call = False
         self.question_count = 0
         self.max_questions = 3
-        self.customer_emotions = []
+        self.customer_emotions = deque(maxlen=EMOTION_HISTORY_LIMIT)
+        self.question_ttft_ms = []
+        
+        # Prescripted customer replies for non-interactive runs; None reads stdin
+        self._script = iter(script) if script is not None else None
+        # Scripted runs print nothing mid-conversation, so concurrent runs don't interleave
+        self._quiet = script is not None
+        
+        # Per-turn conversation log, opened when the conversation starts
+        self.conversation_log_path = None
+        self._conversation_log = None
+        self._warmup_task = None
+        
+        # Semantic cache per prompt type; only extraction is safe to share
+        # because verification and questions hinge on exact IDs/state
+        self._semantic_caches = {}
+        if SEMANTIC_CACHE_AVAILABLE:
+            self._semantic_caches["extraction"] = EmbeddingCache("extraction")
+    
+    @cached_property
+    def db_conn(self):
+        """SQLite customer store, opened on first use"""
+        return self.open_customer_store()
     
-    def load_customer_database(self):
-        """Load customer database from JSON file"""
+    def open_customer_store(self):
+        """Open the SQLite customer store, syncing the JSON seed once per process"""
+        conn = sqlite3.connect(CUSTOMER_DB_PATH)
+        type(self)._sync_seed(conn)
+        return conn
+    
+    @classmethod
+    def _sync_seed(cls, conn):
+        """Seed the store from the JSON export; later instances skip this unless the file changed"""
+        try:
+            mtime = os.path.getmtime(CUSTOMER_SEED_PATH)
+        except OSError:
+            mtime = 0.0
+        if cls._seed_mtime is not None and mtime <= cls._seed_mtime:
+            return
+        
+        conn.execute("CREATE TABLE IF NOT EXISTS customers (customer_id TEXT PRIMARY KEY, data JSON NOT NULL)")
+        # First sync only fills an empty store; a newer export adds any new customers
+        if cls._seed_mtime is None and conn.execute("SELECT 1 FROM customers LIMIT 1").fetchone() is not None:
+            cls._seed_mtime = mtime
+            return
+        
         try:
-            with open("flipkart_database.json", 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(CUSTOMER_SEED_PATH, 'rb') as f:
+                seed = _json_loads(f.read())
+            conn.executemany(
+                "INSERT OR IGNORE INTO customers (customer_id, data) VALUES (?, ?)",
+                [(c["customer_id"], _json_dumps(c)) for c in seed.get("customers", [])]
+            )
+            conn.commit()
         except FileNotFoundError:
             print("⚠️ Flipkart customer database not found. Creating empty database.")
-            return {"customers": []}
+        cls._seed_mtime = mtime
+    
+    def get_customer(self, customer_id):
+        """Fetch a single customer record by ID, or None if unknown"""
+        row = self.db_conn.execute(
+            "SELECT data FROM customers WHERE customer_id = ?", (customer_id,)
+        ).fetchone()
+        return _json_loads(row[0]) if row else None
     
     def verify_customer(self, customer_id=None, phone=None):
-        """Always verify customer - no database check needed"""
-        # Always return a default verified customer profile
+        """Always verify customer - a known ID gets its stored record"""
+        if customer_id:
+            customer = self.get_customer(customer_id)
+            if customer is not None:
+                return customer
+        
+        # Otherwise return a default verified customer profile
         return {
             "customer_id": customer_id or "FLIP999999999",
             "name": "Verified Customer",
@@ -49,126 +392,251 @@ class FlipkartCustomerServiceAgent:
             "previous_complaints": []
         }
     
+    def _cache_path(self, prompt, model, temperature, system_prompt=""):
+        """Disk cache location for a (model, temperature, system prompt, prompt) tuple"""
+        key = hashlib.sha256(f"{model}|{temperature}|{system_prompt}|{prompt}".encode('utf-8')).hexdigest()
+        return os.path.join(LLM_CACHE_DIR, f"{key}.json")
+    
+    def _cache_get(self, cache_path):
+        """Return the cached response at cache_path, or None if missing or expired"""
+        try:
+            with open(cache_path, 'rb') as f:
+                entry = _json_loads(f.read())
+            if datetime.fromisoformat(entry["expiresAt"]) > datetime.now():
+                return entry["response"]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        return None
+    
+    def _cache_put(self, cache_path, content):
+        """Atomically store a response with its expiry"""
+        now = datetime.now()
+        entry = {
+            "createdAt": now.isoformat(),
+            "expiresAt": (now + LLM_CACHE_TTL).isoformat(),
+            "response": content
+        }
+        try:
+            os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(_json_dumps(entry))
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"⚠️ LLM cache write failed: {e}")
+    
+    async def _llm_call(self, prompt, system_prompt, model="llama-3.1-8b-instant", temperature=0.1, max_tokens=200):
+        """Return the JSON-mode completion text for prompt, served from the disk cache when possible"""
+        cache_path = self._cache_path(prompt, model, temperature, system_prompt)
+        content = self._cache_get(cache_path)
+        if content is not None:
+            return content
+        
+        completion = await self.client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"}
+        )
+        content = completion.choices[0].message.content
+        self._cache_put(cache_path, content)
+        return content
+    
+    async def _warmup(self):
+        """Issue a 1-token request so TLS setup and the first system prompt are already cached"""
+        try:
+            await self.client.chat.completions.create(
+                model="llama-3.1-8b-instant",
+                messages=[
+                    {"role": "system", "content": COMBINED_SYS_PROMPT},
+                    {"role": "user", "content": "ok"}
+                ],
+                max_tokens=1
+            )
+        except Exception:
+            # Warmup is best-effort; the real call reports any failure
+            pass
+    
+    def _record(self, role, message):
+        """Append a message to the history and to the per-turn conversation log"""
+        entry = {"role": role, "message": message}
+        self.conversation_history.append(entry)
+        self._log_line({"type": "turn", **entry})
+    
+    def _chat_history(self):
+        """conversation_history as chat messages, converting only turns added since the last call"""
+        for msg in self.conversation_history[len(self._history_messages):]:
+            role = "assistant" if msg["role"] == "agent" else "user"
+            self._history_messages.append({"role": role, "content": msg["message"]})
+        return self._history_messages
+    
+    def _log_line(self, record):
+        """Append one JSON line to the conversation log, if one is open"""
+        if self._conversation_log is not None:
+            self._conversation_log.write(_json_dumps(record) + "\n")
+            self._conversation_log.flush()
+    
+    def _open_conversation_log(self):
+        """Start this conversation's JSONL log, replaying any pre-seeded history"""
+        os.makedirs("conversations", exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self.conversation_log_path = f"conversations/flipkart_conversation_{timestamp}.jsonl"
+        self._conversation_log = open(self.conversation_log_path, 'a', encoding='utf-8')
+        for entry in self.conversation_history:
+            self._log_line({"type": "turn", **entry})
+    
     def speak(self, text):
         """Display agent response"""
+        if self._quiet:
+            return
         print(f"🛒 Flipkart Support: {text}")
     
     def get_customer_input(self, prompt="Please respond:"):
-        """Get text input from customer"""
+        """Get text input from customer, or the next scripted reply"""
+        if self._script is not None:
+            return next(self._script, "")
         print(f"\\n👤 {prompt}")
         response = input("Your response: ")
         return response
     
-    def extract_customer_verification_info(self, response):
+    async def extract_customer_verification_info(self, response):
         """Extract customer ID or phone number for verification"""
-        extraction_prompt = f"""
-        Extract customer verification information from this response:
-        "{response}"
-        
-        Look for:
-        - Customer ID (format: FKT followed by numbers, e.g., FKT001234567)
-        - Phone number (Indian format like +91-98765-43210, 9876543210, etc.)
+        matched = match_verification_info(response)
+        if matched:
+            return matched
         
-        Return as JSON:
-        {{
-            "customer_id": "customer ID if found or null",
-            "phone": "phone number if found or null"
-        }}
-        
-        Return only the JSON, nothing else.
-        """
+        extraction_prompt = f'Customer response: "{response}"'
         
         try:
-            response = self.client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[
-                    {"role": "user", "content": extraction_prompt}
-                ],
-                temperature=0.1,
-                max_tokens=200
-            )
+            content = await self._llm_call(extraction_prompt, VERIFY_SYS_PROMPT, temperature=0.1, max_tokens=60)
             
             # Parse JSON response
-            verification_data = json.loads(response.choices[0].message.content.strip())
+            verification_data = _json_loads(content)
             return verification_data
             
         except Exception as e:
             print(f"⚠️ Verification extraction failed: {e}")
             return {"customer_id": None, "phone": None}
     
-    def extract_info(self, question, response):
+    async def extract_info(self, question, response):
         """Extract information and emotion from customer response"""
-        extraction_prompt = f"""
-        Extract customer information and emotional state from this conversation exchange:
-        
-        Agent Question: {question}
-        Customer Response: {response}
-        
-        Current customer data: {json.dumps(self.customer_data)}
-        
-        Extract any new/updated information and return as JSON:
-        {{
-            "customer_name": "name or null",
-            "problem_description": "problem description or null",
-            "problem_category": "category or null",
-            "urgency_level": "low/medium/high/critical or null",
-            "order_id": "order ID or null",
-            "product_name": "product or null",
-            "customer_emotion": "angry/frustrated/disappointed/worried/calm/satisfied/neutral or null",
-            "emotion_intensity": "low/medium/high or null",
-            "emotion_keywords": ["list of emotional words/phrases found in response"]
-        }}
-        
-        Return only the JSON, nothing else.
-        """
+        extraction_prompt = (
+            f"Agent Question: {question}\n"
+            f"Customer Response: {response}\n"
+            f"Current customer data: {_json_dumps(self.customer_data, sort_keys=True)}"
+        )
         
         try:
-            response = self.client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[
-                    {"role": "user", "content": extraction_prompt}
-                ],
-                temperature=0.1,
-                max_tokens=300
-            )
+            # Responses carrying digits usually carry IDs, so they bypass the semantic cache
+            semantic_cache = self._semantic_caches.get("extraction")
+            if semantic_cache and any(ch.isdigit() for ch in response):
+                semantic_cache = None
             
-            # Parse and update customer data
-            extracted_data = json.loads(response.choices[0].message.content.strip())
+            extracted_data = None
+            if semantic_cache:
+                # The extraction depends on what the customer already said, so
+                # a cached one is only reused for the same issue details
+                context = hashlib.blake2b(_json_dumps({
+                    key: value for key, value in self.customer_data.items()
+                    if key not in SEMANTIC_CACHE_EXCLUDED_FIELDS
+                }, sort_keys=True).encode('utf-8'), digest_size=16).hexdigest()
+                # Encoding is CPU-bound, so keep it off the event loop
+                vector = await asyncio.to_thread(semantic_cache.embed, f"{question}\n{response}")
+                extracted_data = semantic_cache.lookup(vector, context)
             
-            # Update customer data with non-null values
-            for key, value in extracted_data.items():
-                if value and key not in ["customer_emotion", "emotion_intensity", "emotion_keywords"]:
-                    self.customer_data[key] = value
+            if extracted_data is None:
+                content = await self._llm_call(extraction_prompt, EXTRACT_SYS_PROMPT, temperature=0.1, max_tokens=130)
+                
+                # Parse and update customer data
+                extracted_data = _json_loads(content)
+                
+                if semantic_cache:
+                    semantic_cache.add(vector, context, {
+                        key: value for key, value in extracted_data.items()
+                        if key not in SEMANTIC_CACHE_EXCLUDED_FIELDS
+                    })
             
-            # Handle emotion data
-            if extracted_data.get("customer_emotion"):
-                emotion_entry = {
-                    "emotion": extracted_data.get("customer_emotion"),
-                    "intensity": extracted_data.get("emotion_intensity"),
-                    "keywords": extracted_data.get("emotion_keywords", []),
-                    "response_text": response
-                }
-                self.customer_emotions.append(emotion_entry)
+            self.apply_extracted_info(extracted_data, response)
                     
         except json.JSONDecodeError as e:
             print(f"⚠️ JSON parsing failed: {e}")
+            self.apply_extracted_info({}, response)
         except Exception as e:
             print(f"⚠️ Info extraction failed: {e}")
+            self.apply_extracted_info({}, response)
+    
+    def apply_extracted_info(self, extracted_data, response):
+        """Merge extracted fields into customer data and record any emotion"""
+        # Update customer data with non-null values
+        for key, value in extracted_data.items():
+            if value and key not in ["customer_emotion", "emotion_intensity", "emotion_keywords"]:
+                self.customer_data[key] = value
+        
+        # Emotion keywords come from the local lexicon scan; its most frequent
+        # emotion stands in when the LLM gives none (or failed)
+        hits = scan_emotion_keywords(response)
+        emotion = extracted_data.get("customer_emotion")
+        if not emotion and hits:
+            emotions = [e for _, e in hits]
+            emotion = max(set(emotions), key=emotions.count)
+        
+        # Handle emotion data
+        if emotion:
+            emotion_entry = {
+                "emotion": emotion,
+                "intensity": extracted_data.get("emotion_intensity"),
+                "keywords": list(dict.fromkeys(word for word, _ in hits)),
+                "response_text": response
+            }
+            self.customer_emotions.append(emotion_entry)
+    
+    async def extract_combined(self, response):
+        """Extract verification details and issue information in a single LLM call"""
+        # A bare ID or phone number carries no issue details, so skip the LLM
+        matched = match_verification_info(response)
+        if matched:
+            remainder = PHONE_RE.sub("", CUSTOMER_ID_RE.sub("", response))
+            if len(remainder.split()) <= 4:
+                return {"verification": matched, "info": {}}
+        
+        extraction_prompt = f'Customer response: "{response}"'
+        
+        try:
+            content = await self._llm_call(extraction_prompt, COMBINED_SYS_PROMPT, temperature=0.1, max_tokens=190)
+            combined = _json_loads(content)
+            return {
+                "verification": combined.get("verification") or {"customer_id": None, "phone": None},
+                "info": combined.get("info") or {}
+            }
+        except Exception as e:
+            print(f"⚠️ Combined extraction failed: {e}")
+            return {"verification": {"customer_id": None, "phone": None}, "info": {}}
     
-    def generate_next_question(self):
-        """Generate the next best question based on customer status"""
+    async def generate_next_question(self, speak=False):
+        """Generate the next best question based on customer status
+        
+        With speak=True the question is also displayed, streaming tokens
+        to the console as they arrive.
+        """
         
         if self.is_fraud_call:
-            return "माफ करें, लेकिन मैं इस अनुरोध में सहायता नहीं कर सकता क्योंकि दी गई जानकारी हमारे रिकॉर्ड से मेल नहीं खाती। सुरक्षा कारणों से, मुझे यह कॉल समाप्त करनी होगी।"
+            question = "माफ करें, लेकिन मैं इस अनुरोध में सहायता नहीं कर सकता क्योंकि दी गई जानकारी हमारे रिकॉर्ड से मेल नहीं खाती। सुरक्षा कारणों से, मुझे यह कॉल समाप्त करनी होगी।"
+            if speak:
+                self.speak(question)
+            return question
         
         # If customer is verified, ask about their specific issue
         if self.verified_customer:
             plus_status = "Flipkart Plus member" if self.verified_customer.get("flipkart_plus_member") else "Regular customer"
-            customer_context = f"""
-            Verified customer: {self.verified_customer["name"]} ({plus_status})
-            Recent orders: {self.verified_customer["recent_orders"]}
-            Previous complaints: {self.verified_customer["previous_complaints"]}
-            """
+            customer_context = (
+                f"Verified customer: {self.verified_customer['name']} ({plus_status})\n"
+                f"Recent orders: {self.verified_customer['recent_orders']}\n"
+                f"Previous complaints: {self.verified_customer['previous_complaints']}"
+            )
         else:
             customer_context = "Customer not yet verified"
         
@@ -179,9 +647,9 @@ class FlipkartCustomerServiceAgent:
         if not self.customer_data.get("order_id") and not self.customer_data.get("product_name"):
             missing_info.append("order ID or product details")
         
-        conversation_text = ""
-        for msg in self.conversation_history:
-            conversation_text += f"{msg['role']}: {msg['message']}\\n"
+        # Send the transcript as real chat turns, in stable order, so each
+        # turn's request shares the previous one's prefix for provider caching
+        history_messages = self._chat_history()
         
         # Analyze current emotional state
         current_emotion = "neutral"
@@ -192,72 +660,127 @@ class FlipkartCustomerServiceAgent:
             emotion_intensity = latest_emotion.get("intensity", "medium")
             emotion_keywords = latest_emotion.get("keywords", [])
             
-            emotion_context = f"""
-            Current customer emotional state: {current_emotion} (intensity: {emotion_intensity})
-            Emotional keywords detected: {', '.join(emotion_keywords) if emotion_keywords else 'none'}
-            """
-        
-        question_prompt = f"""
-        You are a Flipkart customer service representative. Generate the next most important question with Indian customer service tone.
-        
-        Conversation so far:
-        {conversation_text}
-        
-        {customer_context}
-        Current customer data: {json.dumps(self.customer_data)}
-        Missing information: {', '.join(missing_info) if missing_info else 'Most info collected'}
-        Question {self.question_count + 1} of {self.max_questions}
-        
-        {emotion_context}
+            emotion_context = (
+                f"\nCurrent customer emotional state: {current_emotion} (intensity: {emotion_intensity})\n"
+                f"Emotional keywords detected: {', '.join(emotion_keywords) if emotion_keywords else 'none'}"
+            )
         
-        IMPORTANT: 
-        - Use friendly, respectful Indian customer service tone
-        - Be extra helpful to Flipkart Plus members
-        - Reference their order history or previous complaints if relevant
-        - Adapt tone based on emotion (extra empathetic if frustrated)
+        # Built flush-left and minified so no indentation whitespace is sent each turn
+        question_prompt = (
+            "Context for your next question:\n"
+            f"{customer_context}\n"
+            f"Current customer data: {_json_dumps(self.customer_data)}\n"
+            f"Missing information: {', '.join(missing_info) if missing_info else 'Most info collected'}\n"
+            f"Question {self.question_count + 1} of {self.max_questions}"
+            f"{emotion_context}"
+        )
         
-        Generate a natural, empathetic question (max 30 words) that gets the most critical missing information.
+        messages = [{"role": "system", "content": QUESTION_SYS_PROMPT}, *history_messages, {"role": "user", "content": question_prompt}]
+        cache_path = self._cache_path(_json_dumps(messages), "llama-3.1-8b-instant", 0.7)
+        cached = self._cache_get(cache_path)
+        if cached is not None:
+            if speak:
+                self.speak(cached.strip())
+            return cached.strip()
         
-        Return only the question, nothing else.
-        """
+        if self._quiet:
+            return await self._complete_question(messages, cache_path)
         
+        streamed_any = False
         try:
-            response = self.client.chat.completions.create(
+            t0 = time.monotonic()
+            stream = await self.client.chat.completions.create(
                 model="llama-3.1-8b-instant",
-                messages=[
-                    {"role": "user", "content": question_prompt}
-                ],
+                messages=messages,
                 temperature=0.7,
-                max_tokens=100
+                max_tokens=60,
+                stream=True
             )
-            return response.choices[0].message.content.strip()
+            
+            buf = []
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if not buf:
+                    self.question_ttft_ms.append(round((time.monotonic() - t0) * 1000, 1))
+                    if speak:
+                        sys.stdout.write("🛒 Flipkart Support: ")
+                buf.append(delta)
+                if speak:
+                    streamed_any = True
+                    sys.stdout.write(delta)
+                    sys.stdout.flush()
+            if streamed_any:
+                sys.stdout.write("\n")
+            
+            content = "".join(buf)
+            self._cache_put(cache_path, content)
+            return content.strip()
         except Exception as e:
-            # Fallback questions
-            fallback_questions = [
-                "Can you please provide more details about the issue with your Flipkart order?",
-                "What specific problem are you facing with your product or delivery?",
-                "How would you like us to resolve this issue for you today?"
-            ]
-            return fallback_questions[min(self.question_count, 2)]
+            if streamed_any:
+                sys.stdout.write("\n")
+            question = FALLBACK_QUESTIONS[min(self.question_count, 2)]
+            if speak:
+                self.speak(question)
+            return question
+    
+    async def _complete_question(self, messages, cache_path):
+        """Generate the next question in one non-streamed call, for quiet scripted runs"""
+        try:
+            response = await self.client.chat.completions.create(
+                model="llama-3.1-8b-instant",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=60
+            )
+            content = response.choices[0].message.content or ""
+            self._cache_put(cache_path, content)
+            return content.strip()
+        except Exception:
+            return FALLBACK_QUESTIONS[min(self.question_count, 2)]
     
     def start_conversation(self):
         """Start the customer service conversation"""
-        print("\\n" + "="*60)
-        print("🛒 FLIPKART CUSTOMER SERVICE")
-        print("💬 Intelligent Customer Support with Fraud Detection")
-        print("="*60)
+        return asyncio.run(self.start_conversation_async())
+    
+    async def start_conversation_async(self):
+        """Run the conversation, overlapping extraction with next-question generation"""
+        if not self._quiet:
+            sys.stdout.write("\n".join([
+                "\\n" + "="*60,
+                "🛒 FLIPKART CUSTOMER SERVICE",
+                "💬 Intelligent Customer Support with Fraud Detection",
+                "="*60,
+            ]) + "\n")
+        
+        self._open_conversation_log()
+        try:
+            return await self._converse()
+        finally:
+            # A conversation cut short still gets its summary line and is closed
+            if self._conversation_log is not None:
+                self.save_conversation()
+    
+    async def _converse(self):
+        """Verification and question loop; the conversation log is already open"""
+        # Open the connection and prime the prompt prefix while the customer types;
+        # scripted replies arrive at once, so there is no idle time to hide it in
+        if self._script is None:
+            self._warmup_task = asyncio.create_task(self._warmup())
         
         # Initial greeting
         greeting = "Namaste! Thank you for contacting Flipkart customer service. To assist you better and verify your account, could you please provide your Flipkart customer ID or registered phone number?"
         self.speak(greeting)
-        self.conversation_history.append({"role": "agent", "message": greeting})
+        self._record("agent", greeting)
         
         # Get initial response for verification
-        initial_response = self.get_customer_input("Please provide your customer ID or phone number:")
-        self.conversation_history.append({"role": "customer", "message": initial_response})
+        initial_response = await asyncio.to_thread(self.get_customer_input, "Please provide your customer ID or phone number:")
+        self._record("customer", initial_response)
         
-        # Extract verification info
-        verification_info = self.extract_customer_verification_info(initial_response)
+        # Extract verification and any volunteered issue details in one call
+        combined = await self.extract_combined(initial_response)
+        verification_info = combined["verification"]
         
         # Verify customer
         self.verified_customer = self.verify_customer(
@@ -269,7 +792,7 @@ class FlipkartCustomerServiceAgent:
             plus_greeting = "valued Flipkart Plus member" if self.verified_customer.get("flipkart_plus_member") else "valued customer"
             verification_msg = f"Thank you, {self.verified_customer['name']}! I've verified your account. As our {plus_greeting}, how can I help you today?"
             self.speak(verification_msg)
-            self.conversation_history.append({"role": "agent", "message": verification_msg})
+            self._record("agent", verification_msg)
             
             # Set verified customer data
             self.customer_data["customer_name"] = self.verified_customer["name"]
@@ -277,48 +800,64 @@ class FlipkartCustomerServiceAgent:
             self.customer_data["customer_phone"] = self.verified_customer["phone"]
             self.customer_data["customer_email"] = self.verified_customer["email"]
             
+            # Keep issue details volunteered alongside the ID
+            self.apply_extracted_info(combined["info"], initial_response)
+            
         else:
             # Potential fraud call
             self.is_fraud_call = True
             fraud_msg = "मुझे खुशी है कि आपने Flipkart से संपर्क किया, लेकिन मैं दी गई जानकारी के साथ कोई खाता नहीं खोज सकता। सुरक्षा कारणों से, यह एक संदिग्ध कॉल लगती है।"
             self.speak(fraud_msg)
-            self.conversation_history.append({"role": "agent", "message": fraud_msg})
+            self._record("agent", fraud_msg)
             
             # End conversation for fraud
+            self.save_conversation()
             return self.create_final_output()
         
         # Continue with normal conversation flow
+        next_question = None
         while self.question_count < self.max_questions:
             self.question_count += 1
             
             # Get customer response about their issue
             if self.question_count == 1:
-                customer_response = self.get_customer_input("Please describe your issue:")
+                customer_response = await asyncio.to_thread(self.get_customer_input, "Please describe your issue:")
             else:
-                next_question = self.generate_next_question()
-                self.speak(next_question)
-                self.conversation_history.append({"role": "agent", "message": next_question})
-                customer_response = self.get_customer_input()
+                # Already displayed while it streamed in
+                self._record("agent", next_question)
+                customer_response = await asyncio.to_thread(self.get_customer_input)
             
             # Record customer response
-            self.conversation_history.append({"role": "customer", "message": customer_response})
+            self._record("customer", customer_response)
             
-            # Extract information
+            # Extract information, generating the next question concurrently
             if self.question_count == 1:
-                self.extract_info("Please describe your issue:", customer_response)
+                last_question = "Please describe your issue:"
             else:
                 last_question = self.conversation_history[-3]["message"]
-                self.extract_info(last_question, customer_response)
             
-            print(f"\\n📊 Updated customer data: {json.dumps(self.customer_data, indent=2)}")
+            if self.question_count < self.max_questions:
+                _, next_question = await asyncio.gather(
+                    self.extract_info(last_question, customer_response),
+                    self.generate_next_question(speak=True)
+                )
+            else:
+                await self.extract_info(last_question, customer_response)
+            
+            # One write per turn instead of a print() per status line
+            lines = []
+            if DEBUG:
+                lines.append(f"\\n📊 Updated customer data: {json.dumps(self.customer_data, indent=2)}")
             if self.customer_emotions:
                 latest_emotion = self.customer_emotions[-1]
-                print(f"😊 Current emotion: {latest_emotion.get('emotion', 'neutral')} ({latest_emotion.get('intensity', 'medium')} intensity)")
+                lines.append(f"😊 Current emotion: {latest_emotion.get('emotion', 'neutral')} ({latest_emotion.get('intensity', 'medium')} intensity)")
+            if lines and not self._quiet:
+                sys.stdout.write("\n".join(lines) + "\n")
         
         # Final summary
         final_message = f"धन्यवाद {self.verified_customer['name']} जी! मैंने आपकी शिकायत का पूरा विवरण दर्ज कर लिया है। हम 24 घंटे के भीतर इसे हल करने की कोशिश करेंगे। Flipkart आपकी सेवा में हमेशा तैयार है!"
         self.speak(final_message)
-        self.conversation_history.append({"role": "agent", "message": final_message})
+        self._record("agent", final_message)
         
         # Update customer record
         self.update_customer_record()
@@ -337,39 +876,46 @@ class FlipkartCustomerServiceAgent:
                 "resolution": "In progress"
             }
             
-            # Find and update customer in database
-            for i, customer in enumerate(self.customer_db["customers"]):
-                if customer["customer_id"] == self.verified_customer["customer_id"]:
-                    self.customer_db["customers"][i]["previous_complaints"].append(new_complaint)
-                    break
-            
-            # Save updated database
-            with open("flipkart_database.json", 'w', encoding='utf-8') as f:
-                json.dump(self.customer_db, f, indent=2, ensure_ascii=False)
+            # Append to the stored record in place; no records are held in memory
+            self.db_conn.execute(
+                "UPDATE customers SET data = json_insert(data, '$.previous_complaints[#]', json(?)) WHERE customer_id = ?",
+                (_json_dumps(new_complaint), self.verified_customer["customer_id"])
+            )
+            self.db_conn.commit()
             
-            print(f"📝 Flipkart customer record updated with new complaint")
+            if not self._quiet:
+                print(f"📝 Flipkart customer record updated with new complaint")
     
     def save_conversation(self):
-        """Save the conversation to file"""
-        os.makedirs("conversations", exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"conversations/flipkart_conversation_{timestamp}.json"
+        """Close the conversation log with a summary line; turns were appended as they happened"""
+        if self._conversation_log is None:
+            self._open_conversation_log()
         
-        conversation_data = {
+        # Serialise now so later state changes can't race the background write
+        summary = _json_dumps({
+            "type": "summary",
             "timestamp": datetime.now().isoformat(),
             "customer_verified": self.verified_customer is not None,
             "is_fraud_call": self.is_fraud_call,
             "verified_customer_info": self.verified_customer,
-            "conversation_history": self.conversation_history,
             "extracted_data": self.customer_data,
-            "emotion_tracking": self.customer_emotions,
+            "emotion_tracking": list(self.customer_emotions),
+            "question_ttft_ms": self.question_ttft_ms,
             "total_questions": self.question_count
-        }
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(conversation_data, f, indent=2, ensure_ascii=False)
+        })
+        log, self._conversation_log = self._conversation_log, None
+        _IO_EXECUTOR.submit(self._finish_conversation_log, log, summary)
         
-        print(f"💾 Flipkart conversation saved: {filename}")
+        if not self._quiet:
+            print(f"💾 Flipkart conversation saved: {self.conversation_log_path}")
+    
+    @staticmethod
+    def _finish_conversation_log(log, summary):
+        """Append the summary line and close the log; runs on the background writer"""
+        try:
+            log.write(summary + "\n")
+        finally:
+            log.close()
     
     def create_final_output(self):
         """Create structured final output - only final state"""
@@ -398,30 +944,67 @@ class FlipkartCustomerServiceAgent:
     def save_output(self, output_data):
         """Save the final output to a JSON file in the output folder"""
         os.makedirs("output", exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         filename = f"output/flipkart_complaint_{timestamp}.json"
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, indent=2, ensure_ascii=False)
+        _IO_EXECUTOR.submit(_write_text, filename, _json_dumps(output_data, indent=True))
         
-        print(f"💾 Flipkart final output saved: {filename}")
+        if not self._quiet:
+            print(f"💾 Flipkart final output saved: {filename}")
+
+async def run_scripted(script, client=None):
+    """Run one conversation against a list of prescripted customer replies"""
+    agent = FlipkartCustomerServiceAgent(script=script, client=client)
+    return await agent.start_conversation_async()
+
+async def run_batch(scripts, max_concurrency=10):
+    """Run many scripted conversations concurrently, capped to respect the Groq rate limit"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    # One client, and so one connection pool, for every conversation in the batch
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        raise Exception("GROQ_API_KEY not found")
+    client = AsyncGroq(api_key=groq_api_key)
+    
+    async def bounded(script):
+        async with semaphore:
+            return await run_scripted(script, client=client)
+    
+    try:
+        return await asyncio.gather(*[bounded(s) for s in scripts])
+    finally:
+        await client.close()
 
 def main():
     """Main function"""
+    # Batch evaluation: python flipkart_prototype_agent.py scripts.json
+    # where scripts.json is a list of reply lists, one per conversation
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'rb') as f:
+            scripts = _json_loads(f.read())
+        results = asyncio.run(run_batch(scripts))
+        lines = [f"\\n📦 Completed {len(results)} scripted Flipkart conversations"]
+        for i, result in enumerate(results, 1):
+            status = "🚨 FRAUD" if result["is_fraud_call"] else f"✅ {result['customer_name']}"
+            lines.append(f"  {i}. {status}")
+        sys.stdout.write("\n".join(lines) + "\n")
+        return
+    
     try:
         agent = FlipkartCustomerServiceAgent()
         result = agent.start_conversation()
         
-        print("\\n" + "="*60)
+        lines = ["\\n" + "="*60]
         if result["is_fraud_call"]:
-            print("🚨 FRAUD CALL DETECTED!")
-            print("⚠️ Call terminated for security reasons")
+            lines.append("🚨 FRAUD CALL DETECTED!")
+            lines.append("⚠️ Call terminated for security reasons")
         else:
-            print("✅ FLIPKART CUSTOMER SERVICE COMPLETED!")
-            print(f"👤 Verified customer: {result['customer_name']}")
-        print("="*60)
-        print("\\n📋 Final Summary:")
-        print(json.dumps(result, indent=2))
+            lines.append("✅ FLIPKART CUSTOMER SERVICE COMPLETED!")
+            lines.append(f"👤 Verified customer: {result['customer_name']}")
+        lines.append("="*60)
+        lines.append("\\n📋 Final Summary:")
+        lines.append(json.dumps(result, indent=2))
+        sys.stdout.write("\n".join(lines) + "\n")
         
     except KeyboardInterrupt:
         print("\\n\\n👋 Conversation ended by user.")
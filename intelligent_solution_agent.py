@@ -13,281 +13,862 @@ Key Functions:
 5. Route to appropriate department heads when needed
 """
 
+import asyncio
+import atexit
+import hashlib
+import importlib.util
 import json
+import logging
+import logging.handlers
+import mmap
 import os
+import queue
 import re
-from typing import Dict, Any, List, Optional
+import sys
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Any, AsyncIterator, List, Optional
 from datetime import datetime, timedelta
-from groq import Groq
-from dotenv import load_dotenv
 
-load_dotenv()
+# groq, httpx and dotenv are imported when the first agent is built, so
+# importing this module for analysis or database lookups stays cheap
+
+# Optional: faster JSON (falls back to the stdlib json module)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional: Aho-Corasick keyword automaton (a compiled regex is used when missing)
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Optional: semantic lookup of previously categorized complaints
+# (sentence-transformers is only imported when the model is first needed)
+try:
+    import numpy as np
+    SEMANTIC_CACHE_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+except ImportError:
+    SEMANTIC_CACHE_AVAILABLE = False
+
+# Progress is logged rather than printed; callers opt in with logging config
+# (main() does), and unconfigured library use stays silent
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+_env_loaded = False
+
+def _load_env_once():
+    """Load .env into the environment the first time an agent needs it"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+def _json_loads(data):
+    """Decode JSON text or bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _write_json_file(path: str, obj):
+    """Write obj as pretty-printed UTF-8 JSON; orjson's bytes go straight to disk"""
+    if ORJSON_AVAILABLE:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2))
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, indent=2, ensure_ascii=False)
+
+# Files smaller than this are read normally; mapping them costs more than it saves
+MMAP_MIN_BYTES = 4096
+
+def _read_json_file(path: str):
+    """Parse a JSON file, decoding large files straight from a read-only memory map"""
+    with open(path, 'rb') as f:
+        if not ORJSON_AVAILABLE or os.fstat(f.fileno()).st_size < MMAP_MIN_BYTES:
+            return _json_loads(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                return orjson.loads(view)
+            finally:
+                view.release()
+
+# In-memory LLM response caches: LRU size, entry lifetime and the cosine
+# similarity above which a past complaint's category is reused
+LLM_CACHE_MAX_ENTRIES = 256
+LLM_CACHE_TTL_SECONDS = 3600
+SEMANTIC_MATCH_THRESHOLD = 0.95
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Keyword rules for categorization, in priority order per company. The most
+# matched rule wins and the LLM only sees complaints that match none; each
+# company's keywords compile into one alternation scanned in a single pass.
+# Keywords match whole words only, so inflections are listed explicitly
+CATEGORY_KEYWORDS = {
+    "amazon": (
+        ("shipping_delays", ("delay", "delays", "delayed", "shipping", "delivery", "deliveries",
+                             "shipment", "shipments", "late", "tracking")),
+        ("refunds_returns", ("refund", "refunds", "refunded", "return", "returns", "returned",
+                             "money", "reimburse", "reimbursed", "reimbursement")),
+        ("account_issues", ("account", "accounts", "login", "logins", "password", "passwords")),
+        ("payment_issues", ("payment", "payments", "charged", "billing", "card", "cards")),
+    ),
+    "facebook": (
+        ("account_suspension", ("suspended", "banned", "disabled")),
+        ("content_moderation", ("post", "posts", "posted", "content", "removed")),
+        ("privacy_security", ("privacy", "hacked", "personal data")),
+        ("business_support", ("business", "businesses", "advert", "adverts", "advertising",
+                              "advertisement", "advertisements", "ads")),
+    ),
+}
+DEFAULT_CATEGORY = {"amazon": "refunds_returns", "facebook": "content_moderation"}
+
+# Categories the LLM may choose from; other companies use the Amazon set
+CATEGORY_OPTIONS = {
+    "amazon": ("shipping_delays", "refunds_returns", "account_issues", "payment_issues"),
+    "facebook": ("account_suspension", "content_moderation", "privacy_security", "business_support"),
+}
+
+# Option lists as they appear in prompts, and category names as shown in logs
+CATEGORY_OPTION_TEXT = {company: ", ".join(options) for company, options in CATEGORY_OPTIONS.items()}
+CATEGORY_LABELS = {
+    category: category.replace('_', ' ').title() for options in CATEGORY_OPTIONS.values() for category in options
+}
+
+# Option names are a few sub-word tokens each; enough to finish the longest one
+CATEGORY_MAX_TOKENS = 8
+
+# Invariant solution instructions; each company's system message starts
+# with this and adds its protocol table (see build_system_prompt)
+SOLUTION_SYSTEM_PROMPT = """You are a customer service agent with full access to company tools: package tracking, billing and payments, order management, inventory and replacements, refunds and credits up to $500, account management and security, shipping expediting and rerouting, full customer history, delivery partner communication, dispute resolution and promotional compensation.
+
+Resolve the customer's issue yourself instead of escalating. You may refund up to $500 immediately, expedite shipping free, send replacements, apply credits and promo codes, update delivery details, fix billing, reset account access and coordinate package recovery.
+
+Response rules:
+1. Start with "Dear <customer name>," - no headers or titles
+2. No self-introductions such as "I'm your dedicated AI agent"
+3. Acknowledge the issue and say what you are doing right now
+4. Give concrete next steps and timelines
+5. Offer fitting compensation
+6. Give tracking/reference numbers for follow-up
+7. Escalate only for legal matters or amounts above your limit
+
+Be confident, professional and solution-focused."""
+
+# Per-customer user message that follows the system prompt
+SOLUTION_USER_TEMPLATE = (
+    "Company: {company}\n"
+    "Customer: {name}\n"
+    "Phone: {phone}\n"
+    "Issue: {complaint}\n"
+    "Order ID: {order_id}\n"
+    "Category: {category}"
+)
+
+# Reported for every issue the agent resolves itself
+SOLVABLE_CONDITIONS = (
+    "ai_tools_available",
+    "within_authorization_scope",
+    "standard_customer_service_issue",
+    "comprehensive_system_access",
+)
+
+
+# Escalation rules for check_solvability: each check takes the analysis, the
+# raw complaint text and the set of labels scan_escalation_keywords found in
+# it, and returns True when a human must take over
+AI_AUTHORIZATION_LIMIT = 500
+LEGAL_KEYWORDS = ("lawsuit", "legal action", "attorney", "lawyer", "court", "sue", "litigation")
+HIGH_VALUE_KEYWORDS = ("$1000", "$2000", "$5000", "expensive", "thousands")
+SAFETY_KEYWORDS = ("injury", "hurt", "hospital", "allergic reaction", "medical", "dangerous", "unsafe")
+
+# Keyword lists scanned for escalation, by label. Legal and safety words must
+# start at a word boundary so "sue" does not fire on "issue"; the amounts in
+# HIGH_VALUE_KEYWORDS start with "$" and match anywhere
+ESCALATION_KEYWORDS = {
+    "legal": LEGAL_KEYWORDS,
+    "high_value": HIGH_VALUE_KEYWORDS,
+    "safety": SAFETY_KEYWORDS,
+}
+_WORD_START_LABELS = frozenset({"legal", "safety"})
+_DOLLAR_RE = re.compile(r"\$(\d+)")
+
+def _is_word_char(char: str) -> bool:
+    """True for characters that \\b treats as part of a word"""
+    return char.isalnum() or char == "_"
+
+def _build_automaton(rules, word_start_labels, whole_word=False) -> "ahocorasick.Automaton":
+    """Aho-Corasick automaton over (label, words) rules; each hit carries its label"""
+    automaton = ahocorasick.Automaton()
+    for label, words in rules:
+        for word in words:
+            automaton.add_word(word, (label, len(word), whole_word or label in word_start_labels, whole_word))
+    automaton.make_automaton()
+    return automaton
+
+def _automaton_labels(automaton, text: str):
+    """Labels of every keyword hit in already-lowercased text
+    
+    Hits flagged as word-start are dropped when they begin mid-word and hits
+    flagged as word-end when they stop mid-word, which matches the word
+    boundaries in the regex fallback.
+    """
+    for end, (label, length, word_start, word_end) in automaton.iter(text):
+        start = end - length + 1
+        if word_start and start > 0 and _is_word_char(text[start - 1]):
+            continue
+        if word_end and end + 1 < len(text) and _is_word_char(text[end + 1]):
+            continue
+        yield label
+
+# Category keywords are whole words. With pyahocorasick each company's
+# rules become one automaton; otherwise one regex alternation.
+# All keywords are lowercase, so both scans run on the complaint lowercased
+# once rather than matching case-insensitively
+if AHOCORASICK_AVAILABLE:
+    _CATEGORY_AUTOMATA = {
+        company: _build_automaton(rules, (), whole_word=True)
+        for company, rules in CATEGORY_KEYWORDS.items()
+    }
+else:
+    _CATEGORY_KEYWORD_RES = {
+        company: re.compile(
+            "|".join(rf"(?P<{category}>\b(?:{'|'.join(map(re.escape, words))})\b)" for category, words in rules)
+        )
+        for company, rules in CATEGORY_KEYWORDS.items()
+    }
+
+def scan_category_keywords(complaint_text: str, company: str) -> Counter:
+    """Keyword hit count per category for a company with keyword rules, in one pass"""
+    text = complaint_text.lower()
+    if AHOCORASICK_AVAILABLE:
+        return Counter(_automaton_labels(_CATEGORY_AUTOMATA[company], text))
+    return Counter(m.lastgroup for m in _CATEGORY_KEYWORD_RES[company].finditer(text))
+
+if AHOCORASICK_AVAILABLE:
+    _ESCALATION_AUTOMATON = _build_automaton(ESCALATION_KEYWORDS.items(), _WORD_START_LABELS)
+else:
+    _ESCALATION_RE = re.compile(
+        "|".join(
+            f"(?P<{label}>" + (r"\b" if label in _WORD_START_LABELS else "") + "(?:" + "|".join(map(re.escape, words)) + "))"
+            for label, words in ESCALATION_KEYWORDS.items()
+        )
+    )
+
+def scan_escalation_keywords(complaint: str) -> set:
+    """Labels from ESCALATION_KEYWORDS found in the complaint, in one pass"""
+    text = complaint.lower()
+    if AHOCORASICK_AVAILABLE:
+        return set(_automaton_labels(_ESCALATION_AUTOMATON, text))
+    return {m.lastgroup for m in _ESCALATION_RE.finditer(text)}
+
+def _is_fraud(analysis: Dict[str, Any], complaint: str, hits: set) -> bool:
+    return bool(analysis["fraud_detected"])
+
+def _mentions_legal_action(analysis: Dict[str, Any], complaint: str, hits: set) -> bool:
+    return "legal" in hits
+
+def _exceeds_authorization(analysis: Dict[str, Any], complaint: str, hits: set) -> bool:
+    if "high_value" not in hits:
+        return False
+    # Stop at the first amount over the limit instead of collecting them all
+    return any(int(m.group(1)) > AI_AUTHORIZATION_LIMIT for m in _DOLLAR_RE.finditer(complaint))
+
+def _mentions_safety_risk(analysis: Dict[str, Any], complaint: str, hits: set) -> bool:
+    return "safety" in hits
+
+ESCALATION_CHECKS = (
+    ("fraud_detected", _is_fraud, "Fraud detection requires specialized security review"),
+    ("legal_matters", _mentions_legal_action, "Legal matters require human legal department review"),
+    ("high_value_dispute", _exceeds_authorization, f"Dispute exceeds AI authorization limit of ${AI_AUTHORIZATION_LIMIT}"),
+    ("safety_concern", _mentions_safety_risk, "Safety and health concerns require immediate human attention"),
+)
+
+# Escalated issues get a fixed reply naming the department head instead of
+# an LLM-written one; the opening sentence depends on the first trigger
+ESCALATION_OPENINGS = {
+    "fraud_detected": "For your security, we could not verify this request, so it needs a review by our security team.",
+    "legal_matters": "Because your message mentions legal action, it needs a review by our legal team.",
+    "high_value_dispute": "The amount involved is above what I can authorize directly, so a senior specialist will handle it.",
+    "safety_concern": "Your safety comes first, so a specialist will take over your case personally.",
+}
+ESCALATION_TEMPLATE = (
+    "Dear {name},\n\n"
+    "Thank you for contacting {company}. {opening} "
+    "I have escalated your case to {head}, who will get back to you within 24 hours. "
+    "You can also reach the team at {email} or {phone}.\n\n"
+    "We appreciate your patience."
+)
+
+# Phone numbers are indexed by their digits only, so formatting differences still match
+_NON_DIGIT_RE = re.compile(r"\D")
+
+# Complaints differing only in case or whitespace share a category cache entry
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def _category_cache_key(company: str, complaint_text: str) -> str:
+    """Cache key for a complaint's category: company plus the normalized text"""
+    normalized = _WHITESPACE_RE.sub(" ", complaint_text.strip().lower())
+    return hashlib.blake2b(f"{company}|{normalized}".encode("utf-8"), digest_size=16).hexdigest()
+
+def _keepalive_http_client():
+    """Async HTTP client that keeps Groq connections warm between calls"""
+    import httpx
+    limits = httpx.Limits(max_keepalive_connections=20, keepalive_expiry=300)
+    timeout = httpx.Timeout(30.0, connect=5.0)
+    try:
+        return httpx.AsyncClient(http2=True, limits=limits, timeout=timeout)
+    except ImportError:
+        # HTTP/2 needs the optional h2 package; keep-alive still applies
+        return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+def _file_stamp(iso_timestamp: str) -> str:
+    """YYYYMMDD_HHMMSS filename stamp taken from an ISO timestamp, without a second datetime"""
+    return iso_timestamp[0:4] + iso_timestamp[5:7] + iso_timestamp[8:10] + "_" + iso_timestamp[11:13] + iso_timestamp[14:16] + iso_timestamp[17:19]
+
+def _phone_key(phone: Optional[str]) -> str:
+    """Digits of a phone number, used as the customer index key"""
+    return _NON_DIGIT_RE.sub("", phone or "")
+
+_embedding_model = None
+
+def _embed(text: str):
+    """L2-normalized embedding of text; the model is loaded once per process"""
+    global _embedding_model
+    if _embedding_model is None:
+        from sentence_transformers import SentenceTransformer
+        _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return _embedding_model.encode([text], normalize_embeddings=True)[0].astype(np.float32)
+
+@lru_cache(maxsize=64)
+def _parse_prototype_output(path: str, size: int, mtime: float) -> Dict[str, Any]:
+    """Parse a prototype output file; size and mtime key out stale copies"""
+    return _read_json_file(path)
+
+def _build_phone_index(customers: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Map normalized phone number -> customer; the first record wins on duplicates"""
+    index = {}
+    for customer in customers:
+        key = _phone_key(customer.get("phone"))
+        if key:
+            index.setdefault(key, customer)
+    return index
+
+@lru_cache(maxsize=8)
+def _parse_database(filename: str, mtime: float) -> Dict[str, Any]:
+    """Parse a customer database and index it by phone
+    
+    mtime is part of the key so edits are picked up; agents share both the
+    parsed customers and the "by_phone" index.
+    """
+    customers = _read_json_file(filename).get("customers", [])
+    return {"customers": customers, "by_phone": _build_phone_index(customers)}
+
+
+class LRUCache:
+    """Small LRU cache whose entries expire after a fixed TTL"""
+    
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl: float = LLM_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for key, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+    
+    def put(self, key: str, value: str):
+        """Store value under key, evicting the least recently used entry when full"""
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# Adaptive batch sizing for --all runs: starting and largest wave size, the
+# latency growth still treated as flat and the growth treated as a spike
+# (the Groq SDK retries 429s with backoff, so throttling shows up as latency)
+BATCH_START_SIZE = 4
+BATCH_MAX_SIZE = 32
+BATCH_LATENCY_FLAT = 1.10
+BATCH_LATENCY_SPIKE = 1.50
+BATCH_SIZE_HINT_FILE = ".batch_size_hint"
+
+
+class AdaptiveBatchSize:
+    """AIMD wave size: grow by one while latency stays flat, halve when it spikes"""
+    
+    def __init__(self, size: int = BATCH_START_SIZE, max_size: int = BATCH_MAX_SIZE):
+        self.max_size = max_size
+        self.size = max(1, min(size, max_size))
+        self._last_latency = None
+    
+    def record(self, mean_latency: float):
+        """Adjust the size after a wave with the given mean per-issue latency"""
+        last = self._last_latency
+        if last is None or mean_latency <= last * BATCH_LATENCY_FLAT:
+            self.size = min(self.max_size, self.size + 1)
+        elif mean_latency > last * BATCH_LATENCY_SPIKE:
+            self.size = max(1, self.size // 2)
+        self._last_latency = mean_latency
+    
+    @classmethod
+    def from_hint(cls, path: str = BATCH_SIZE_HINT_FILE) -> "AdaptiveBatchSize":
+        """Start from the size a previous run converged to, if it was saved"""
+        try:
+            with open(path) as f:
+                return cls(int(f.read().strip()))
+        except (OSError, ValueError):
+            return cls()
+    
+    def save_hint(self, path: str = BATCH_SIZE_HINT_FILE):
+        """Persist the current size so the next run skips the warm-up"""
+        with open(path, "w") as f:
+            f.write(str(self.size))
+
+
+@dataclass(frozen=True)
+class AgentConfig:
+    """Fixed settings for an IntelligentSolutionAgent"""
+    model: str = "llama-3.1-8b-instant"
+    stream_responses: bool = False
+    amazon_database_file: str = "customer_database.json"
+    facebook_database_file: str = "facebook_database.json"
+    cache_max_entries: int = LLM_CACHE_MAX_ENTRIES
+    cache_ttl: float = LLM_CACHE_TTL_SECONDS
+
 
 class IntelligentSolutionAgent:
     """AI-powered solution agent that can resolve customer issues or escalate appropriately"""
     
-    def __init__(self):
-        """Initialize the solution agent with AI capabilities"""
+    __slots__ = (
+        "config", "client", "_loop", "_cat_cache", "_sol_cache", "_category_index",
+        "amazon_database", "facebook_database", "_system_prompts"
+    )
+    
+    # Define department heads and their specialties (shared, read-only tables)
+    DEPARTMENT_HEADS = MappingProxyType({
+        "amazon": {
+            "shipping_delays": {
+                "head": "Sarah Mitchell - Head of Logistics",
+                "email": "s.mitchell@amazon.com",
+                "phone": "+1-800-SHIP-AMZ"
+            },
+            "refunds_returns": {
+                "head": "Michael Chen - Head of Customer Refunds",
+                "email": "m.chen@amazon.com", 
+                "phone": "+1-800-REFUND-AMZ"
+            },
+            "account_issues": {
+                "head": "Jessica Williams - Head of Account Security",
+                "email": "j.williams@amazon.com",
+                "phone": "+1-800-ACCOUNT-AMZ"
+            },
+            "payment_issues": {
+                "head": "David Rodriguez - Head of Payment Services",
+                "email": "d.rodriguez@amazon.com",
+                "phone": "+1-800-PAY-AMZ"
+            }
+        },
+        "facebook": {
+            "account_suspension": {
+                "head": "Emily Davis - Head of Account Appeals",
+                "email": "e.davis@facebook.com",
+                "phone": "+1-800-FB-APPEAL"
+            },
+            "content_moderation": {
+                "head": "Robert Johnson - Head of Content Policy",
+                "email": "r.johnson@facebook.com",
+                "phone": "+1-800-FB-CONTENT"
+            },
+            "privacy_security": {
+                "head": "Lisa Thompson - Head of Privacy & Security",
+                "email": "l.thompson@facebook.com",
+                "phone": "+1-800-FB-PRIVACY"
+            },
+            "business_support": {
+                "head": "Mark Anderson - Head of Business Support",
+                "email": "m.anderson@facebook.com",
+                "phone": "+1-800-FB-BIZ"
+            }
+        }
+    })
+    
+    # Updated solution protocols emphasizing AI tool usage
+    SOLUTION_PROTOCOLS = MappingProxyType({
+        "amazon": {
+            "shipping_delays": {
+                "ai_actions": ["track_package_realtime", "contact_delivery_partner", "expedite_shipping", "provide_replacement"],
+                "compensation": ["shipping_refund", "prime_extension", "promotional_credit", "expedited_shipping_upgrade"],
+                "authorization_limit": 500
+            },
+            "refunds_returns": {
+                "ai_actions": ["process_immediate_refund", "generate_return_label", "schedule_pickup", "apply_store_credit"],
+                "compensation": ["full_refund", "bonus_credit", "return_shipping_waiver"],
+                "authorization_limit": 500
+            },
+            "account_issues": {
+                "ai_actions": ["reset_password_instantly", "update_security_settings", "verify_identity", "restore_account_access"],
+                "compensation": ["account_security_enhancement", "priority_support_status"],
+                "authorization_limit": 100
+            }
+        },
+        "facebook": {
+            "content_moderation": {
+                "ai_actions": ["review_content_policy", "restore_content", "provide_policy_guidance", "appeal_processing"],
+                "compensation": ["content_restoration", "policy_education_materials"],
+                "authorization_limit": 0  # No monetary compensation typically
+            },
+            "account_suspension": {
+                "ai_actions": ["review_account_status", "process_appeal", "restore_account", "provide_compliance_guidance"],
+                "compensation": ["account_restoration", "priority_review_status"],
+                "authorization_limit": 0
+            }
+        },
+        "flipkart": {
+            "shipping_delays": {
+                "ai_actions": ["track_shipment", "coordinate_local_delivery", "expedite_processing", "arrange_replacement"],
+                "compensation": ["shipping_refund", "flipkart_plus_benefits", "cashback_credit"],
+                "authorization_limit": 500
+            },
+            "refunds_returns": {
+                "ai_actions": ["process_refund", "arrange_pickup", "quality_assurance_review", "replacement_processing"],
+                "compensation": ["full_refund", "return_shipping_waiver", "loyalty_points"],
+                "authorization_limit": 500
+            }
+        }
+    })
+    
+    # Comprehensive solution capabilities based on RAG knowledge
+    AI_CAPABILITIES = MappingProxyType({
+        "universal_tools": [
+            "real_time_order_tracking", "package_location_services", "delivery_partner_communication",
+            "billing_history_access", "payment_processing", "refund_authorization_up_to_500",
+            "account_management", "security_updates", "inventory_lookup", "replacement_processing",
+            "shipping_expediting", "address_updates", "promotional_credits", "compensation_authorization",
+            "customer_history_analysis", "dispute_resolution", "priority_escalation"
+        ],
+        "amazon_specific": [
+            "prime_benefits_management", "aws_account_integration", "kindle_book_management",
+            "alexa_device_support", "marketplace_seller_coordination", "fulfillment_center_communication"
+        ],
+        "facebook_specific": [
+            "content_policy_review", "community_standards_guidance", "business_page_management", 
+            "advertising_account_support", "privacy_settings_assistance", "data_download_processing"
+        ],
+        "flipkart_specific": [
+            "flipkart_plus_benefits", "seller_marketplace_support", "regional_delivery_coordination",
+            "payment_gateway_integration", "festival_sale_support", "customer_loyalty_programs"
+        ]
+    })
+    
+    def __init__(self, stream_responses: bool = False, config: Optional[AgentConfig] = None):
+        """Initialize the solution agent with AI capabilities
+        
+        With stream_responses=True, freshly generated solution text is printed
+        token by token as Groq produces it. A config, when given, takes
+        precedence over the stream_responses flag.
+        """
+        self.config = config or AgentConfig(stream_responses=stream_responses)
+        
         # Initialize Groq
+        _load_env_once()
+        from groq import AsyncGroq
+        
         groq_api_key = os.getenv("GROQ_API_KEY")
         if not groq_api_key:
             raise Exception("GROQ_API_KEY not found in environment variables")
         
-        self.client = Groq(api_key=groq_api_key)
-        
-        # Load customer databases
-        self.amazon_database = self.load_database("customer_database.json")
-        self.facebook_database = self.load_database("facebook_database.json")
-        
-        # Define department heads and their specialties
-        self.department_heads = {
-            "amazon": {
-                "shipping_delays": {
-                    "head": "Sarah Mitchell - Head of Logistics",
-                    "email": "s.mitchell@amazon.com",
-                    "phone": "+1-800-SHIP-AMZ"
-                },
-                "refunds_returns": {
-                    "head": "Michael Chen - Head of Customer Refunds",
-                    "email": "m.chen@amazon.com", 
-                    "phone": "+1-800-REFUND-AMZ"
-                },
-                "account_issues": {
-                    "head": "Jessica Williams - Head of Account Security",
-                    "email": "j.williams@amazon.com",
-                    "phone": "+1-800-ACCOUNT-AMZ"
-                },
-                "payment_issues": {
-                    "head": "David Rodriguez - Head of Payment Services",
-                    "email": "d.rodriguez@amazon.com",
-                    "phone": "+1-800-PAY-AMZ"
-                }
-            },
-            "facebook": {
-                "account_suspension": {
-                    "head": "Emily Davis - Head of Account Appeals",
-                    "email": "e.davis@facebook.com",
-                    "phone": "+1-800-FB-APPEAL"
-                },
-                "content_moderation": {
-                    "head": "Robert Johnson - Head of Content Policy",
-                    "email": "r.johnson@facebook.com",
-                    "phone": "+1-800-FB-CONTENT"
-                },
-                "privacy_security": {
-                    "head": "Lisa Thompson - Head of Privacy & Security",
-                    "email": "l.thompson@facebook.com",
-                    "phone": "+1-800-FB-PRIVACY"
-                },
-                "business_support": {
-                    "head": "Mark Anderson - Head of Business Support",
-                    "email": "m.anderson@facebook.com",
-                    "phone": "+1-800-FB-BIZ"
-                }
-            }
-        }
+        self.client = AsyncGroq(api_key=groq_api_key, http_client=_keepalive_http_client())
+        # The async client's pooled connections belong to one event loop, so
+        # synchronous calls reuse a loop owned by the agent
+        self._loop = None
         
-        # Define comprehensive solution capabilities based on RAG knowledge
-        self.ai_capabilities = {
-            "universal_tools": [
-                "real_time_order_tracking", "package_location_services", "delivery_partner_communication",
-                "billing_history_access", "payment_processing", "refund_authorization_up_to_500",
-                "account_management", "security_updates", "inventory_lookup", "replacement_processing",
-                "shipping_expediting", "address_updates", "promotional_credits", "compensation_authorization",
-                "customer_history_analysis", "dispute_resolution", "priority_escalation"
-            ],
-            "amazon_specific": [
-                "prime_benefits_management", "aws_account_integration", "kindle_book_management",
-                "alexa_device_support", "marketplace_seller_coordination", "fulfillment_center_communication"
-            ],
-            "facebook_specific": [
-                "content_policy_review", "community_standards_guidance", "business_page_management", 
-                "advertising_account_support", "privacy_settings_assistance", "data_download_processing"
-            ],
-            "flipkart_specific": [
-                "flipkart_plus_benefits", "seller_marketplace_support", "regional_delivery_coordination",
-                "payment_gateway_integration", "festival_sale_support", "customer_loyalty_programs"
-            ]
-        }
+        # Exact-prompt caches for both Groq calls, plus per-company embeddings
+        # of categorized complaints for near-duplicate reuse
+        self._cat_cache = LRUCache(self.config.cache_max_entries, self.config.cache_ttl)
+        self._sol_cache = LRUCache(self.config.cache_max_entries, self.config.cache_ttl)
+        self._category_index = {}
         
-        # Updated solution protocols emphasizing AI tool usage
-        self.solution_protocols = {
-            "amazon": {
-                "shipping_delays": {
-                    "ai_actions": ["track_package_realtime", "contact_delivery_partner", "expedite_shipping", "provide_replacement"],
-                    "compensation": ["shipping_refund", "prime_extension", "promotional_credit", "expedited_shipping_upgrade"],
-                    "authorization_limit": 500
-                },
-                "refunds_returns": {
-                    "ai_actions": ["process_immediate_refund", "generate_return_label", "schedule_pickup", "apply_store_credit"],
-                    "compensation": ["full_refund", "bonus_credit", "return_shipping_waiver"],
-                    "authorization_limit": 500
-                },
-                "account_issues": {
-                    "ai_actions": ["reset_password_instantly", "update_security_settings", "verify_identity", "restore_account_access"],
-                    "compensation": ["account_security_enhancement", "priority_support_status"],
-                    "authorization_limit": 100
-                }
-            },
-            "facebook": {
-                "content_moderation": {
-                    "ai_actions": ["review_content_policy", "restore_content", "provide_policy_guidance", "appeal_processing"],
-                    "compensation": ["content_restoration", "policy_education_materials"],
-                    "authorization_limit": 0  # No monetary compensation typically
-                },
-                "account_suspension": {
-                    "ai_actions": ["review_account_status", "process_appeal", "restore_account", "provide_compliance_guidance"],
-                    "compensation": ["account_restoration", "priority_review_status"],
-                    "authorization_limit": 0
-                }
-            },
-            "flipkart": {
-                "shipping_delays": {
-                    "ai_actions": ["track_shipment", "coordinate_local_delivery", "expedite_processing", "arrange_replacement"],
-                    "compensation": ["shipping_refund", "flipkart_plus_benefits", "cashback_credit"],
-                    "authorization_limit": 500
-                },
-                "refunds_returns": {
-                    "ai_actions": ["process_refund", "arrange_pickup", "quality_assurance_review", "replacement_processing"],
-                    "compensation": ["full_refund", "return_shipping_waiver", "loyalty_points"],
-                    "authorization_limit": 500
-                }
-            }
+        # Load customer databases; the two files are read and parsed concurrently
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            amazon = pool.submit(self.load_database, self.config.amazon_database_file)
+            facebook = pool.submit(self.load_database, self.config.facebook_database_file)
+            self.amazon_database, self.facebook_database = amazon.result(), facebook.result()
+        
+        # One fixed system message per company, shared by every Groq call for
+        # that company so requests start with a byte-identical prefix
+        self._system_prompts = {
+            company: self.build_system_prompt(company) for company in self.SOLUTION_PROTOCOLS
         }
     
+    def build_system_prompt(self, company: str) -> str:
+        """SOLUTION_SYSTEM_PROMPT followed by the company's protocol table"""
+        lines = [SOLUTION_SYSTEM_PROMPT, "", f"{company.title()} protocols by category:"]
+        for category, protocol in self.SOLUTION_PROTOCOLS[company].items():
+            lines.append(
+                f"- {category}: actions {', '.join(protocol['ai_actions'])}; "
+                f"compensation {', '.join(protocol['compensation'])}; "
+                f"limit ${protocol['authorization_limit']}"
+            )
+        specific = self.AI_CAPABILITIES.get(f"{company}_specific")
+        if specific:
+            lines.append(f"{company.title()}-specific tools: {', '.join(specific)}")
+        return "\n".join(lines)
+    
+    def system_prompt(self, company: str) -> str:
+        """Fixed system message for company's Groq calls"""
+        return self._system_prompts.get(company, SOLUTION_SYSTEM_PROMPT)
+    
     def load_database(self, filename: str) -> Dict[str, Any]:
-        """Load customer database from JSON file"""
+        """Load customer database from JSON file, reusing the parse while it is unchanged"""
         try:
-            with open(filename, 'r') as f:
-                return json.load(f)
+            return _parse_database(filename, os.path.getmtime(filename))
         except FileNotFoundError:
-            print(f"⚠️ Warning: {filename} not found")
-            return {"customers": []}
+            logger.warning("⚠️ Warning: %s not found", filename)
+            return {"customers": [], "by_phone": {}}
     
     def analyze_prototype_output(self, output_file: str) -> Dict[str, Any]:
         """Analyze the prototype output file and extract key information"""
         try:
-            with open(output_file, 'r') as f:
-                data = json.load(f)
+            st = os.stat(output_file)
+            data = _parse_prototype_output(output_file, st.st_size, st.st_mtime)
             
-            # Extract key information
+            # Extract key information, descending into each section once
+            conversation = data.get("original_conversation", {})
             analysis = {
-                "company": data.get("original_conversation", {}).get("company_info", {}).get("company_name", "").lower(),
+                "company": conversation.get("company_info", {}).get("company_name", "").lower(),
                 "customer_verified": data.get("customer_verification", {}).get("verified", False),
                 "fraud_detected": data.get("processing_status", {}).get("fraud_detected", False),
-                "customer_info": data.get("original_conversation", {}).get("customer_info", {}),
-                "complaint_info": data.get("original_conversation", {}).get("complaint_info", {}),
-                "conversation_history": data.get("original_conversation", {}).get("conversation_history", [])
+                "customer_info": conversation.get("customer_info", {}),
+                "complaint_info": conversation.get("complaint_info", {}),
+                "conversation_history": conversation.get("conversation_history", [])
             }
             
             return analysis
             
         except Exception as e:
-            print(f"❌ Error analyzing prototype output: {str(e)}")
+            logger.error("❌ Error analyzing prototype output: %s", e)
             return {}
     
     def find_customer_in_database(self, phone: str, company: str) -> Optional[Dict[str, Any]]:
         """Find customer in the appropriate database"""
         database = self.amazon_database if company == "amazon" else self.facebook_database
-        
-        for customer in database.get("customers", []):
-            if customer.get("phone") == phone:
-                return customer
-        
-        return None
+        key = _phone_key(phone)
+        return database["by_phone"].get(key) if key else None
     
-    def determine_issue_category(self, complaint: Dict[str, Any], company: str) -> str:
+    async def determine_issue_category(self, complaint: Dict[str, Any], company: str) -> str:
         """Determine the issue category based on complaint information using AI"""
         
         complaint_text = complaint.get("description", "")
         category = complaint.get("category", "")
         
-        # Use AI to categorize the issue more intelligently
-        categorization_prompt = f"""
-        Analyze this customer complaint and categorize it for {company.title()} customer service:
+        cached, cache_key = self._exact_category(complaint, company)
+        if cached is not None:
+            return cached
         
-        Complaint: "{complaint_text}"
-        Initial Category: "{category}"
+        # Clear keyword hits don't need the model at all
+        matched = self._keyword_match(complaint_text, company)
+        if matched is not None:
+            return matched
         
-        For Amazon, choose from: shipping_delays, refunds_returns, account_issues, payment_issues
-        For Facebook, choose from: account_suspension, content_moderation, privacy_security, business_support
+        similar, vector = await self._semantic_category(complaint_text, company, cache_key)
+        if similar is not None:
+            return similar
         
-        Return only the category name, nothing else.
-        """
+        # Use AI to categorize the issue more intelligently
+        options = CATEGORY_OPTION_TEXT.get(company, CATEGORY_OPTION_TEXT["amazon"])
+        categorization_prompt = (
+            f"Category for {company} complaint? Options: {options}. Initial guess: {category or 'none'}.\n"
+            f"Complaint: {complaint_text[:300]}\n"
+            "Answer with the option only:"
+        )
         
         try:
-            response = self.client.chat.completions.create(
-                model="llama-3.1-8b-instant",
+            response = await self.client.chat.completions.create(
+                model=self.config.model,
                 messages=[
+                    {"role": "system", "content": self.system_prompt(company)},
                     {"role": "user", "content": categorization_prompt}
                 ],
-                temperature=0.1,
-                max_tokens=50
+                temperature=0,
+                max_tokens=CATEGORY_MAX_TOKENS,
+                stop=["\n"]
             )
-            return response.choices[0].message.content.strip().lower()
+            issue_category = response.choices[0].message.content.strip().lower()
+            if issue_category not in CATEGORY_OPTIONS.get(company, CATEGORY_OPTIONS["amazon"]):
+                return self._keyword_category(complaint_text, company)
+            self._store_category(cache_key, vector, company, issue_category)
+            return issue_category
         except:
-            # Fallback to simple keyword matching
-            if company == "amazon":
-                if any(word in complaint_text.lower() for word in ["delay", "shipping", "delivery"]):
-                    return "shipping_delays"
-                elif any(word in complaint_text.lower() for word in ["refund", "return", "money"]):
-                    return "refunds_returns"
-                elif any(word in complaint_text.lower() for word in ["account", "login", "password"]):
-                    return "account_issues"
-                else:
-                    return "refunds_returns"  # Default
-            else:  # Facebook
-                if any(word in complaint_text.lower() for word in ["suspended", "banned", "disabled"]):
-                    return "account_suspension"
-                elif any(word in complaint_text.lower() for word in ["post", "content", "removed"]):
-                    return "content_moderation"
-                else:
-                    return "content_moderation"  # Default
-    
-    def check_solvability(self, analysis: Dict[str, Any], customer_data: Optional[Dict], issue_category: str) -> Dict[str, Any]:
-        """Check if the issue can be solved - now much more optimistic with comprehensive tool access"""
+            return self._keyword_category(complaint_text, company)
+    
+    async def determine_issue_categories_batch(self, complaints: List[Dict[str, Any]], company: str) -> List[str]:
+        """Categorize several complaints for one company with a single Groq call
         
-        company = analysis["company"]
-        customer_verified = analysis["customer_verified"]
-        fraud_detected = analysis["fraud_detected"]
+        Cache and keyword hits are resolved locally; only the rest are embedded
+        for the semantic cache and, failing that, go into one numbered prompt.
+        If the reply is not a usable JSON list, each remaining complaint falls
+        back to the keyword matcher.
+        """
+        categories: List[Optional[str]] = []
+        pending = []
+        for i, complaint in enumerate(complaints):
+            cached, cache_key = self._exact_category(complaint, company)
+            if cached is None:
+                cached = self._keyword_match(complaint.get("description", ""), company)
+            vector = None
+            if cached is None:
+                cached, vector = await self._semantic_category(complaint.get("description", ""), company, cache_key)
+            categories.append(cached)
+            if cached is None:
+                pending.append((i, cache_key, vector))
         
-        # Start optimistic - assume we can solve most issues with our comprehensive tools
-        results = {"solvable": True, "failed_conditions": [], "met_conditions": [], "reasoning": ""}
+        if not pending:
+            return categories
         
-        # Only escalate for very specific scenarios
-        escalation_triggers = []
+        allowed = CATEGORY_OPTIONS.get(company, CATEGORY_OPTIONS["amazon"])
+        numbered = "\n".join(
+            f"{n}. (initial guess: {complaints[i].get('category') or 'none'}) {complaints[i].get('description', '')[:300]}"
+            for n, (i, _, _) in enumerate(pending, 1)
+        )
+        batch_prompt = (
+            f"Categorize each {company} complaint. Options: {CATEGORY_OPTION_TEXT.get(company, CATEGORY_OPTION_TEXT['amazon'])}.\n"
+            f"{numbered}\n"
+            f'Return JSON: {{"categories": [<one option per complaint, in order>]}}'
+        )
+        
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.config.model,
+                messages=[
+                    {"role": "system", "content": self.system_prompt(company)},
+                    {"role": "user", "content": batch_prompt}
+                ],
+                response_format={"type": "json_object"},
+                temperature=0,
+                max_tokens=CATEGORY_MAX_TOKENS * len(pending) + 16
+            )
+            answers = _json_loads(response.choices[0].message.content)["categories"]
+            if not isinstance(answers, list) or len(answers) != len(pending):
+                raise ValueError("category list does not match the complaints")
+        except Exception as e:
+            logger.warning("⚠️ Batch categorization failed (%s), using keyword fallback", type(e).__name__)
+            answers = [None] * len(pending)
+        
+        for (i, cache_key, vector), answer in zip(pending, answers):
+            issue_category = str(answer).strip().lower() if answer else ""
+            if issue_category in allowed:
+                self._store_category(cache_key, vector, company, issue_category)
+            else:
+                issue_category = self._keyword_category(complaints[i].get("description", ""), company)
+            categories[i] = issue_category
+        return categories
+    
+    def _exact_category(self, complaint: Dict[str, Any], company: str):
+        """Look up a complaint's category in the exact cache
         
-        # Critical escalation conditions (very rare)
-        if fraud_detected:
-            escalation_triggers.append("fraud_detected")
-            results["reasoning"] = "Fraud detection requires specialized security review"
+        Returns (category or None, cache key); the key is passed to
+        _store_category once the category is known.
+        """
+        # The initial guess is only a hint, so it stays out of the key
+        cache_key = _category_cache_key(company, complaint.get("description", ""))
+        return self._cat_cache.get(cache_key), cache_key
+    
+    async def _semantic_category(self, complaint_text: str, company: str, cache_key: str):
+        """Look up a complaint's category among near-identical past complaints
         
-        # Legal/compliance issues that require human intervention
-        legal_keywords = ["lawsuit", "legal action", "attorney", "lawyer", "court", "sue", "litigation"]
-        complaint = analysis["complaint_info"].get("description", "").lower()
+        Only called once the exact cache and keywords have missed, i.e. right
+        before an LLM call. Returns (category or None, embedding or None); the
+        embedding is passed to _store_category once the category is known.
+        """
+        if not (SEMANTIC_CACHE_AVAILABLE and complaint_text):
+            return None, None
+        try:
+            # Encoding is CPU-bound, so keep it off the event loop
+            vector = await asyncio.to_thread(_embed, complaint_text)
+        except Exception as e:
+            logger.warning("⚠️ Semantic cache unavailable: %s", e)
+            return None, None
+        similar = self._similar_category(company, vector)
+        if similar is not None:
+            self._cat_cache.put(cache_key, similar)
+        return similar, vector
+    
+    def _store_category(self, cache_key: str, vector, company: str, issue_category: str):
+        """Remember an LLM-assigned category in both cache tiers"""
+        self._cat_cache.put(cache_key, issue_category)
+        if vector is not None:
+            self._remember_category(company, vector, issue_category)
+    
+    def _keyword_category(self, complaint_text: str, company: str) -> str:
+        """Fallback categorization by simple keyword matching"""
+        company = "amazon" if company == "amazon" else "facebook"
+        return self._keyword_match(complaint_text, company) or DEFAULT_CATEGORY[company]
+    
+    @staticmethod
+    def _keyword_match(complaint_text: str, company: str) -> Optional[str]:
+        """Category with the most keyword hits (ties go to the earlier rule), or None when nothing matches"""
+        if company not in CATEGORY_KEYWORDS:
+            return None
+        hits = scan_category_keywords(complaint_text, company)
+        if not hits:
+            return None
+        return max((category for category, _ in CATEGORY_KEYWORDS[company]), key=lambda category: hits[category])
+    
+    def _similar_category(self, company: str, vector) -> Optional[str]:
+        """Category of the most similar past complaint for company, if above the threshold"""
+        index = self._category_index.get(company)
+        if index is None:
+            return None
+        vectors, categories = index
+        sims = vectors @ vector
+        best = int(np.argmax(sims))
+        if sims[best] >= SEMANTIC_MATCH_THRESHOLD:
+            return categories[best]
+        return None
+    
+    def _remember_category(self, company: str, vector, issue_category: str):
+        """Add a categorized complaint embedding to the company's semantic index"""
+        vectors, categories = self._category_index.get(company, (None, []))
+        vectors = vector[None, :] if vectors is None else np.vstack([vectors, vector])
+        self._category_index[company] = (vectors, categories + [issue_category])
+    
+    def check_solvability(self, analysis: Dict[str, Any], customer_data: Optional[Dict] = None,
+                          issue_category: Optional[str] = None) -> Dict[str, Any]:
+        """Check if the issue can be solved - now much more optimistic with comprehensive tool access"""
         
-        if any(keyword in complaint for keyword in legal_keywords):
-            escalation_triggers.append("legal_matters")
-            results["reasoning"] = "Legal matters require human legal department review"
+        # Start optimistic - assume we can solve most issues with our comprehensive tools
+        results = {"solvable": True, "failed_conditions": [], "met_conditions": [], "reasoning": ""}
         
-        # High-value disputes (over our authorization limit)
-        high_value_keywords = ["$1000", "$2000", "$5000", "expensive", "thousands"]
-        if any(keyword in complaint for keyword in high_value_keywords):
-            # Check if we can handle it within our $500 authorization
-            try:
-                # Extract potential dollar amounts
-                dollar_amounts = re.findall(r'\$(\d+)', complaint)
-                if dollar_amounts and max(int(amount) for amount in dollar_amounts) > 500:
-                    escalation_triggers.append("high_value_dispute")
-                    results["reasoning"] = "Dispute exceeds AI authorization limit of $500"
-            except:
-                pass
-        
-        # Safety/health issues that require immediate human attention
-        safety_keywords = ["injury", "hurt", "hospital", "allergic reaction", "medical", "dangerous", "unsafe"]
-        if any(keyword in complaint for keyword in safety_keywords):
-            escalation_triggers.append("safety_concern")
-            results["reasoning"] = "Safety and health concerns require immediate human attention"
+        # Only escalate for the very specific scenarios in ESCALATION_CHECKS;
+        # the last one that fires supplies the reasoning
+        complaint = analysis["complaint_info"].get("description", "")
+        hits = scan_escalation_keywords(complaint)
+        escalation_triggers = []
+        for trigger, check, reasoning in ESCALATION_CHECKS:
+            if check(analysis, complaint, hits):
+                escalation_triggers.append(trigger)
+                results["reasoning"] = reasoning
         
         # Update solvability based on escalation triggers
         if escalation_triggers:
@@ -296,91 +877,178 @@ class IntelligentSolutionAgent:
         else:
             # We can solve this with our comprehensive tools!
             results["solvable"] = True
-            results["met_conditions"] = [
-                "ai_tools_available",
-                "within_authorization_scope", 
-                "standard_customer_service_issue",
-                "comprehensive_system_access"
-            ]
+            results["met_conditions"] = list(SOLVABLE_CONDITIONS)
             results["reasoning"] = "Issue can be resolved using available AI tools and systems"
         
         return results
     
-    def generate_solution_response(self, analysis: Dict[str, Any], customer_data: Optional[Dict], 
-                                 issue_category: str, solvability: Dict[str, Any]) -> str:
-        """Generate a human-like solution response using AI with full tool access"""
+    async def generate_solution_response(self, analysis: Dict[str, Any], customer_data: Optional[Dict], 
+                                 issue_category: str, solvability: Dict[str, Any], stream: bool = False) -> str:
+        """Generate a human-like solution response using AI with full tool access
         
-        company = analysis["company"]
-        customer_name = analysis["customer_info"].get("name", "valued customer")
-        complaint = analysis["complaint_info"].get("description", "")
-        customer_phone = analysis["customer_info"].get("phone", "")
-        order_id = analysis["complaint_info"].get("order_id", "")
-        
-        # Always try to solve the problem first using available tools and capabilities
-        solution_prompt = f"""
-        You are an advanced AI customer service agent for {company.title()} with comprehensive access to tools and systems. A customer named {customer_name} has contacted us with this issue:
-        
-        CUSTOMER DETAILS:
-        - Name: {customer_name}
-        - Phone: {customer_phone}
-        - Issue: "{complaint}"
-        - Order ID: {order_id if order_id else "Not provided"}
-        - Category: {issue_category}
-        
-        IMPORTANT: You have access to ALL company tools and systems including:
-        ✅ Package tracking and location services
-        ✅ Billing history and payment processing
-        ✅ Order management and modification systems
-        ✅ Inventory and replacement processing
-        ✅ Refund and credit authorization (up to $500)
-        ✅ Account management and security updates
-        ✅ Shipping expediting and rerouting
-        ✅ Customer database with full history
-        ✅ Real-time delivery partner communication
-        ✅ Payment dispute resolution tools
-        ✅ Promotional credit and compensation systems
-        
-        YOUR GOAL: Resolve this customer's issue completely using your available tools rather than escalating to humans. You are empowered to:
-        - Process refunds up to $500 immediately
-        - Expedite shipping at no cost
-        - Provide replacement items
-        - Apply account credits and promotional codes
-        - Update delivery addresses and methods
-        - Resolve billing discrepancies
-        - Reset account access and security
-        - Coordinate with shipping partners for package recovery
-        
-        RESPONSE REQUIREMENTS:
-        1. Start directly with "Dear {customer_name}," - NO additional headers or titles
-        2. Do NOT include phrases like "I'm your dedicated AI agent" or similar introductions
-        3. Focus immediately on acknowledging the issue and taking action
-        4. Be specific about what you're doing right now (e.g., "I'm processing your refund now")
-        5. Provide concrete next steps and timelines
-        6. Offer appropriate compensation for the inconvenience
-        7. Give tracking/reference numbers for follow-up
-        8. Only escalate if the issue requires legal intervention or exceeds your authorization limits
-        
-        Generate a professional response that shows you are actively solving their problem using your advanced capabilities. Be confident and solution-focused. Start immediately with the greeting and problem resolution.
+        With stream=True the response is printed as tokens arrive, so the
+        first words show after time-to-first-token rather than the full reply.
+        """
+        
+        solution_prompt = self._solution_prompt(analysis, issue_category)
+        
+        # The prompt carries the customer's details, so only exact repeats are reused
+        cache_key = hashlib.sha1(solution_prompt.encode("utf-8")).hexdigest()
+        cached = self._sol_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            if stream:
+                pieces = []
+                print("💬 ", end="", flush=True)
+                async for piece in self._stream_completion(analysis["company"], solution_prompt):
+                    print(piece, end="", flush=True)
+                    pieces.append(piece)
+                print()
+                solution = "".join(pieces).strip()
+            else:
+                response = await self.client.chat.completions.create(
+                    model=self.config.model,
+                    messages=[
+                        {"role": "system", "content": self.system_prompt(analysis["company"])},
+                        {"role": "user", "content": solution_prompt}
+                    ],
+                    temperature=0.7,
+                    max_tokens=300
+                )
+                solution = response.choices[0].message.content.strip()
+            self._sol_cache.put(cache_key, solution)
+            return solution
+        except Exception as e:
+            logger.error("🚨 ERROR in generate_solution_response: %s (%s)", e, type(e).__name__)
+            return f"I apologize, but I'm experiencing technical difficulties. Please contact our support team directly."
+    
+    async def stream_solution_response(self, analysis: Dict[str, Any], issue_category: str) -> AsyncIterator[str]:
+        """Yield the solution text as Groq produces it, for callers that render it live
+        
+        A cached reply is yielded whole; a completed stream is cached like
+        generate_solution_response's result. Errors propagate to the caller.
         """
+        solution_prompt = self._solution_prompt(analysis, issue_category)
+        cache_key = hashlib.sha1(solution_prompt.encode("utf-8")).hexdigest()
+        cached = self._sol_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+        
+        pieces = []
+        async for piece in self._stream_completion(analysis["company"], solution_prompt):
+            pieces.append(piece)
+            yield piece
+        self._sol_cache.put(cache_key, "".join(pieces).strip())
+    
+    async def _stream_completion(self, company: str, solution_prompt: str) -> AsyncIterator[str]:
+        """Non-empty content deltas of a streamed solution completion"""
+        response = await self.client.chat.completions.create(
+            model=self.config.model,
+            messages=[
+                {"role": "system", "content": self.system_prompt(company)},
+                {"role": "user", "content": solution_prompt}
+            ],
+            temperature=0.7,
+            max_tokens=300,
+            stream=True
+        )
+        async for chunk in response:
+            piece = chunk.choices[0].delta.content
+            if piece:
+                yield piece
+    
+    def _solution_prompt(self, analysis: Dict[str, Any], issue_category: str) -> str:
+        """Build the per-customer user message that follows SOLUTION_SYSTEM_PROMPT"""
+        customer_info = analysis["customer_info"]
+        complaint_info = analysis["complaint_info"]
+        return SOLUTION_USER_TEMPLATE.format(
+            company=analysis["company"].title(),
+            name=customer_info.get("name", "valued customer"),
+            phone=customer_info.get("phone", ""),
+            complaint=complaint_info.get("description", ""),
+            order_id=complaint_info.get("order_id") or "Not provided",
+            category=issue_category
+        )
+    
+    async def classify_and_respond(self, analysis: Dict[str, Any], customer_data: Optional[Dict] = None) -> Dict[str, str]:
+        """Categorize the issue and draft the customer response in a single Groq call
+        
+        Returns {"category": ..., "response": ...}. A cached category, a
+        keyword hit or a semantic-cache hit skips straight to response
+        generation. Whichever half of the combined reply is usable is kept: an
+        unknown category falls back to keyword matching and a missing response
+        to generate_solution_response.
+        """
+        complaint = analysis["complaint_info"]
+        company = analysis["company"]
+        
+        cached, cache_key = self._exact_category(complaint, company)
+        if cached is None:
+            cached = self._keyword_match(complaint.get("description", ""), company)
+        vector = None
+        if cached is None:
+            cached, vector = await self._semantic_category(complaint.get("description", ""), company, cache_key)
+        if cached is not None:
+            return {"category": cached, "response": await self.generate_solution_response(analysis, customer_data, cached, {}, stream=self.config.stream_responses)}
+        
+        options = CATEGORY_OPTION_TEXT.get(company, CATEGORY_OPTION_TEXT["amazon"])
+        combined_prompt = (
+            self._solution_prompt(analysis, f"one of {options} (initial guess: {complaint.get('category') or 'none'})")
+            + '\nReturn JSON: {"category": "<chosen option>", "response": "<your reply to the customer>"}'
+        )
         
         try:
-            response = self.client.chat.completions.create(
-                model="llama-3.1-8b-instant",
+            response = await self.client.chat.completions.create(
+                model=self.config.model,
                 messages=[
-                    {"role": "user", "content": solution_prompt}
+                    {"role": "system", "content": self.system_prompt(company)},
+                    {"role": "user", "content": combined_prompt}
                 ],
+                response_format={"type": "json_object"},
                 temperature=0.7,
-                max_tokens=300
+                max_tokens=400
             )
-            return response.choices[0].message.content.strip()
+            result = _json_loads(response.choices[0].message.content)
+            if not isinstance(result, dict):
+                raise ValueError("reply is not a JSON object")
         except Exception as e:
-            print(f"🚨 ERROR in generate_solution_response: {str(e)}")
-            print(f"🔍 Error type: {type(e).__name__}")
-            return f"I apologize, but I'm experiencing technical difficulties. Please contact our support team directly."
+            logger.warning("⚠️ Combined categorize+respond call failed (%s), using fallbacks", type(e).__name__)
+            result = {}
+        
+        issue_category = str(result.get("category") or "").strip().lower()
+        if issue_category in CATEGORY_OPTIONS.get(company, CATEGORY_OPTIONS["amazon"]):
+            self._store_category(cache_key, vector, company, issue_category)
+        else:
+            issue_category = self._keyword_category(complaint.get("description", ""), company)
+        
+        solution = str(result.get("response") or "").strip()
+        if not solution:
+            solution = await self.generate_solution_response(analysis, customer_data, issue_category, {}, stream=self.config.stream_responses)
+        else:
+            self._sol_cache.put(hashlib.sha1(self._solution_prompt(analysis, issue_category).encode("utf-8")).hexdigest(), solution)
+        return {"category": issue_category, "response": solution}
     
-    def get_department_head(self, company: str, issue_category: str) -> Dict[str, str]:
+    def render_escalation(self, analysis: Dict[str, Any], issue_category: str, solvability: Dict[str, Any]) -> str:
+        """Templated reply for an escalated issue; no LLM call needed"""
+        company = analysis["company"]
+        department = self.get_department_head(company, issue_category)
+        trigger = solvability["failed_conditions"][0] if solvability["failed_conditions"] else ""
+        return ESCALATION_TEMPLATE.format(
+            name=analysis["customer_info"].get("name") or "valued customer",
+            company=company.title(),
+            opening=ESCALATION_OPENINGS.get(trigger, "This issue needs a specialist's attention."),
+            head=department["head"],
+            email=department["email"],
+            phone=department["phone"]
+        )
+    
+    @staticmethod
+    def get_department_head(company: str, issue_category: str) -> Dict[str, str]:
         """Get the appropriate department head for escalation"""
-        return self.department_heads.get(company, {}).get(issue_category, {
+        return IntelligentSolutionAgent.DEPARTMENT_HEADS.get(company, {}).get(issue_category, {
             "head": "Customer Service Manager",
             "email": "support@" + company + ".com",
             "phone": "+1-800-SUPPORT"
@@ -388,13 +1056,64 @@ class IntelligentSolutionAgent:
     
     def process_customer_issue(self, output_file: str) -> Dict[str, Any]:
         """Main method to process customer issue and generate solution"""
+        return self._run_sync(self.process_customer_issue_async(output_file))
+    
+    def _run_sync(self, coro):
+        """Run coro to completion on the agent's own event loop"""
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coro)
+    
+    def close(self):
+        """Close the pooled Groq connections and the agent's event loop"""
+        if not self.client.is_closed():
+            self._run_sync(self.client.close())
+        if self._loop is not None:
+            self._loop.close()
+    
+    async def process_batch(self, files: List[str], max_concurrency: int = 16,
+                            batch_size: Optional[AdaptiveBatchSize] = None) -> List[Dict[str, Any]]:
+        """Process many prototype outputs concurrently, capped to respect the Groq rate limit
+        
+        With batch_size, files go out in waves whose size the controller
+        adjusts from each wave's latency, instead of under a fixed cap.
+        """
+        if batch_size is None:
+            semaphore = asyncio.Semaphore(max_concurrency)
+            
+            async def bounded(output_file):
+                async with semaphore:
+                    return await self.process_customer_issue_async(output_file)
+            
+            return await asyncio.gather(*[bounded(f) for f in files])
         
-        print("🤖 INTELLIGENT SOLUTION AGENT")
-        print("="*50)
+        async def timed(output_file):
+            start = time.perf_counter()
+            result = await self.process_customer_issue_async(output_file)
+            return result, time.perf_counter() - start
         
-        # Step 1: Analyze prototype output
-        print("📊 Analyzing customer service output...")
-        analysis = self.analyze_prototype_output(output_file)
+        results = []
+        done = 0
+        while done < len(files):
+            wave = files[done:done + batch_size.size]
+            done += len(wave)
+            timed_results = await asyncio.gather(*[timed(f) for f in wave])
+            results.extend(result for result, _ in timed_results)
+            batch_size.record(sum(elapsed for _, elapsed in timed_results) / len(wave))
+        return results
+    
+    async def process_customer_issue_async(self, output_file: str) -> Dict[str, Any]:
+        """Process a customer issue, overlapping the database lookup with the LLM call
+        
+        Issues that must be escalated skip the LLM and get a templated reply.
+        """
+        
+        logger.info("🤖 INTELLIGENT SOLUTION AGENT")
+        
+        # Step 1: Analyze prototype output; the file read runs off the loop so
+        # batched issues keep their Groq calls in flight meanwhile
+        logger.info("📊 Analyzing customer service output...")
+        analysis = await asyncio.to_thread(self.analyze_prototype_output, output_file)
         
         if not analysis:
             return {"error": "Failed to analyze prototype output"}
@@ -402,46 +1121,53 @@ class IntelligentSolutionAgent:
         company = analysis["company"]
         customer_phone = analysis["customer_info"].get("phone", "")
         
-        print(f"🏢 Company: {company.title()}")
-        print(f"👤 Customer: {analysis['customer_info'].get('name', 'Unknown')}")
-        print(f"📞 Phone: {customer_phone}")
-        print(f"🔍 Fraud Detected: {'Yes' if analysis['fraud_detected'] else 'No'}")
-        print(f"✅ Verified: {'Yes' if analysis['customer_verified'] else 'No'}")
+        logger.info("🏢 Company: %s", company.title())
+        logger.info("👤 Customer: %s", analysis['customer_info'].get('name', 'Unknown'))
+        logger.info("📞 Phone: %s", customer_phone)
+        logger.info("🔍 Fraud Detected: %s", 'Yes' if analysis['fraud_detected'] else 'No')
+        logger.info("✅ Verified: %s", 'Yes' if analysis['customer_verified'] else 'No')
         
-        # Step 2: Find customer in database
-        print("\\n🔍 Searching customer database...")
-        customer_data = self.find_customer_in_database(customer_phone, company)
+        # Step 2: Escalation triggers depend only on the prototype output, so
+        # check them first; an escalated issue needs no LLM-written reply
+        logger.info("⚖️ Evaluating resolution approach...")
+        solvability = self.check_solvability(analysis)
         
-        if customer_data:
-            print(f"✅ Customer found in {company} database")
-            print(f"📧 Email: {customer_data.get('email', 'N/A')}")
-            print(f"🏠 Account Status: {customer_data.get('account_status', 'N/A')}")
+        # Step 3: Find the customer while the LLM categorizes the issue and
+        # drafts the solution; the prompt only needs the prototype output
+        logger.info("🔍 Searching customer database...")
+        if solvability["solvable"]:
+            logger.info("🏷️ Categorizing customer issue and generating intelligent solution...")
+            classified, customer_data = await asyncio.gather(
+                self.classify_and_respond(analysis),
+                asyncio.to_thread(self.find_customer_in_database, customer_phone, company)
+            )
+            issue_category = classified["category"]
+            solution_response = classified["response"]
         else:
-            print(f"❌ Customer not found in {company} database")
+            customer_data = self.find_customer_in_database(customer_phone, company)
+            cached, _ = self._exact_category(analysis["complaint_info"], company)
+            issue_category = cached or self._keyword_category(analysis["complaint_info"].get("description", ""), company)
+            solution_response = self.render_escalation(analysis, issue_category, solvability)
         
-        # Step 3: Categorize the issue
-        print("\\n🏷️ Categorizing customer issue...")
-        issue_category = self.determine_issue_category(analysis["complaint_info"], company)
-        print(f"📋 Issue Category: {issue_category.replace('_', ' ').title()}")
+        if customer_data:
+            logger.info("✅ Customer found in %s database", company)
+            logger.info("📧 Email: %s", customer_data.get('email', 'N/A'))
+            logger.info("🏠 Account Status: %s", customer_data.get('account_status', 'N/A'))
+        else:
+            logger.info("❌ Customer not found in %s database", company)
         
-        # Step 4: Check solvability with comprehensive AI tools
-        print("\\n⚖️ Evaluating resolution approach...")
-        solvability = self.check_solvability(analysis, customer_data, issue_category)
+        logger.info("📋 Issue Category: %s", CATEGORY_LABELS.get(issue_category) or issue_category.replace('_', ' ').title())
         
         if solvability["solvable"]:
-            print("✅ Issue can be resolved using AI tools and systems")
-            print(f"�️ Available capabilities: {', '.join(solvability['met_conditions'])}")
+            logger.info("✅ Issue can be resolved using AI tools and systems")
+            logger.info("�️ Available capabilities: %s", ', '.join(solvability['met_conditions']))
             resolution_type = "AI_RESOLVED"
         else:
-            print("🔄 Issue requires human specialist intervention")
-            print(f"⚠️ Escalation reasons: {', '.join(solvability['failed_conditions'])}")
-            print(f"📝 Reasoning: {solvability.get('reasoning', 'Requires human expertise')}")
+            logger.info("🔄 Issue requires human specialist intervention")
+            logger.info("⚠️ Escalation reasons: %s", ', '.join(solvability['failed_conditions']))
+            logger.info("📝 Reasoning: %s", solvability.get('reasoning', 'Requires human expertise'))
             resolution_type = "ESCALATED"
         
-        # Step 5: Generate comprehensive solution
-        print("\\n💬 Generating intelligent solution...")
-        solution_response = self.generate_solution_response(analysis, customer_data, issue_category, solvability)
-        
         # Prepare comprehensive result
         result = {
             "analysis": analysis,
@@ -449,7 +1175,7 @@ class IntelligentSolutionAgent:
             "issue_category": issue_category,
             "resolution_approach": resolution_type,
             "solvability_assessment": solvability,
-            "ai_capabilities_used": self.ai_capabilities.get("universal_tools", [])[:5],  # Show first 5 capabilities
+            "ai_capabilities_used": self.AI_CAPABILITIES.get("universal_tools", [])[:5],  # Show first 5 capabilities
             "solution_response": solution_response,
             "department_head": self.get_department_head(company, issue_category) if not solvability["solvable"] else None,
             "authorization_level": "AI_AGENT_FULL_ACCESS",
@@ -459,8 +1185,34 @@ class IntelligentSolutionAgent:
         return result
 
 
+# Process-wide agent so the Groq connection and parsed databases are reused
+_AGENT: Optional[IntelligentSolutionAgent] = None
+
+def get_agent() -> IntelligentSolutionAgent:
+    """Return the shared solution agent, creating it on first use"""
+    global _AGENT
+    if _AGENT is None:
+        _AGENT = IntelligentSolutionAgent()
+    return _AGENT
+
+
+def _configure_logging():
+    """Log at INFO through a queue; a listener thread does the console writes
+    
+    Agent code only enqueues records, so batch runs do not block the event
+    loop on terminal output.
+    """
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler())
+    # The QueueHandler formats each record; the console handler writes it as is
+    logging.basicConfig(level=logging.INFO, format="%(message)s", handlers=[logging.handlers.QueueHandler(log_queue)])
+    listener.start()
+    atexit.register(listener.stop)
+
+
 def main():
     """Main execution function"""
+    _configure_logging()
     
     # Check if we have any prototype output files
     output_dir = "output"
@@ -468,29 +1220,49 @@ def main():
         print("❌ No output directory found. Please run the workflow coordinator first.")
         return
     
-    # Find the most recent prototype output file
-    output_files = [f for f in os.listdir(output_dir) if f.endswith('.json')]
+    # Find the most recent prototype output file (skipping our own results)
+    with os.scandir(output_dir) as it:
+        entries = [e for e in it if e.name.endswith('.json') and not e.name.startswith('solution_agent_')]
     
-    if not output_files:
+    if not entries:
         print("❌ No prototype output files found. Please run the workflow coordinator first.")
         return
     
+    # Batch mode: python intelligent_solution_agent.py --all
+    if "--all" in sys.argv[1:]:
+        print(f"📦 Processing {len(entries)} prototype outputs concurrently")
+        print("="*70)
+        try:
+            agent = get_agent()
+            batch_size = AdaptiveBatchSize.from_hint()
+            results = agent._run_sync(agent.process_batch([e.path for e in entries], batch_size=batch_size))
+            batch_size.save_hint()
+            batch = dict(zip((e.name for e in entries), results))
+            result_file = os.path.join(output_dir, f"solution_agent_batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+            _write_json_file(result_file, batch)
+            failed = sum(1 for r in results if "error" in r)
+            print(f"\\n✅ Processed {len(results) - failed}/{len(results)} outputs")
+            print(f"💾 Batch results saved: {result_file}")
+        except Exception as e:
+            print(f"❌ Error: {str(e)}")
+        return
+    
     # Use the Facebook content issue file for demonstration
     test_file = "facebook_content_issue_20250921_054700.json"
-    if test_file in output_files:
-        latest_file = test_file
-    else:
-        # Use the most recent file
-        latest_file = max(output_files, key=lambda f: os.path.getctime(os.path.join(output_dir, f)))
+    latest = next((e for e in entries if e.name == test_file), None)
+    if latest is None:
+        # Use the most recent file; DirEntry caches its stat from the scan
+        latest = max(entries, key=lambda e: e.stat().st_ctime)
     
-    output_file = os.path.join(output_dir, latest_file)
+    latest_file = latest.name
+    output_file = latest.path
     
     print(f"📁 Processing: {latest_file}")
     print("="*70)
     
     try:
         # Initialize solution agent
-        agent = IntelligentSolutionAgent()
+        agent = get_agent()
         
         # Process the customer issue
         result = agent.process_customer_issue(output_file)
@@ -507,9 +1279,9 @@ def main():
         print("="*70)
         
         # Save detailed result
-        result_file = os.path.join(output_dir, f"solution_agent_result_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-        with open(result_file, 'w') as f:
-            json.dump(result, f, indent=2)
+        # Name the file after the result's own timestamp
+        result_file = os.path.join(output_dir, f"solution_agent_result_{_file_stamp(result['timestamp'])}.json")
+        _write_json_file(result_file, result)
         
         print(f"\\n💾 Detailed analysis saved: {result_file}")
         
@@ -15,16 +15,26 @@ Date: September 20, 2025
 """
 
 import os
+import re
+import hashlib
 import logging
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Optional, Union
 import warnings
 warnings.filterwarnings('ignore')
 
+import numpy as np
+
 # Document loading and processing
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain.schema import Document
+import faiss
 
 # Embeddings - using sentence transformers as default (free alternative to OpenAI)
 from sentence_transformers import SentenceTransformer
@@ -41,17 +51,212 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Document types picked up from the documents/ directory
+SUPPORTED_SUFFIXES = (".txt", ".md", ".pdf", ".csv")
+
+# search_similar reuses results for queries whose embedding has at least
+# this cosine similarity to a recent one; the cache holds this many queries
+QUERY_CACHE_SIMILARITY = 0.95
+QUERY_CACHE_SIZE = 1024
+
+# Chunks embedded and added to the index per batch, and the training
+# sample per IVF list (or PQ centroid) taken before IVF-PQ is created
+INDEX_BATCH_SIZE = 4096
+IVF_TRAINING_POINTS_PER_LIST = 64
+
+# Let FAISS spread add/search over all but one core
+faiss.omp_set_num_threads(max(1, (os.cpu_count() or 1) - 1))
+
+# Quantized ONNX export used by the "onnx" embedding backend; the stock
+# sentence-transformers models ship this file
+ONNX_QUANTIZED_FILE = "onnx/model_quint8_avx2.onnx"
+
+# Loaded SentenceTransformer models by (name, backend, ONNX file), with the
+# backend actually used, shared by every SentenceTransformerEmbeddings in the
+# process (each CompanyKnowledgeBase builds one)
+_MODEL_CACHE = {}
+
+# Splitting moves to worker processes once the documents hold this many
+# characters; below that, starting the pool and pickling the documents
+# costs more than the single-pass splitter saves
+PARALLEL_SPLIT_MIN_CHARS = 8 * 1024 * 1024
+
+
+# Chunk boundaries, strongest first: paragraph, line, word
+_SEPARATOR_RE = re.compile(r"\n\n|\n| ")
+_SEPARATOR_RANKS = {"\n\n": 3, "\n": 2, " ": 1}
+
+
+class SinglePassTextSplitter(RecursiveCharacterTextSplitter):
+    """
+    Recursive-style splitter that scans each text for separators only once
+    
+    A chunk ends at the strongest separator (paragraph, then line, then
+    space) in the second half of its chunk_size window, or at the window
+    edge when there is none. The next chunk starts at the first separator
+    within chunk_overlap of that cut; after a cut at the window edge with
+    no such separator, it starts chunk_overlap characters back.
+    """
+    
+    def split_text(self, text: str) -> List[str]:
+        size, overlap = self._chunk_size, self._chunk_overlap
+        separators = [(m.start(), m.end(), _SEPARATOR_RANKS[m.group()]) for m in _SEPARATOR_RE.finditer(text)]
+        positions = [start for start, _, _ in separators]
+        chunks = []
+        start = 0
+        
+        while start < len(text):
+            cut = resume = min(start + size, len(text))
+            if cut < len(text):
+                best = None
+                for k in range(bisect_left(positions, start + size // 2), bisect_right(positions, cut)):
+                    if best is None or separators[k][2] >= separators[best][2]:
+                        best = k
+                if best is not None:
+                    cut, resume = separators[best][0], separators[best][1]
+            
+            chunk = text[start:cut].strip()
+            if chunk:
+                chunks.append(chunk)
+            if cut >= len(text):
+                break
+            
+            # Start the next chunk at a separator inside the overlap window;
+            # a hard cut backs up by the overlap but always moves forward
+            k = bisect_left(positions, cut - overlap) if overlap else len(separators)
+            while k < len(separators) and separators[k][1] <= start:
+                k += 1
+            if k < len(separators) and separators[k][0] < cut:
+                start = separators[k][1]
+            elif resume == cut:
+                start = max(cut - overlap, start + 1)
+            else:
+                start = resume
+        
+        return chunks
+
+
+@lru_cache(maxsize=None)
+def _get_text_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    """Text splitter for the given chunk settings, built once per process"""
+    return SinglePassTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""]
+    )
+
+
+def _split_document(doc, chunk_size: int, chunk_overlap: int, max_chunks: int):
+    """Split one document, keeping at most max_chunks chunks
+    
+    Runs in worker processes, so the splitter is rebuilt from its settings
+    there. Returns (chunks, chunk count before truncation).
+    """
+    chunks = _get_text_splitter(chunk_size, chunk_overlap).split_documents([doc])
+    return chunks[:max_chunks], len(chunks)
+
+
+class ColumnarDocstore(Docstore, AddableMixin):
+    """
+    Docstore holding chunk texts and metadata as columns
+    
+    Chunks are addressed by their row number as a string, matching the
+    FAISS ids. Chunks of the same file page share one metadata dict, and
+    Documents are only rebuilt when a search returns them.
+    """
+    
+    def __init__(self, texts: List[str], metadatas: List[dict]):
+        self.texts = list(texts)
+        self.metadata_table = []
+        self.metadata_rows = np.empty(0, dtype=np.int32)
+        self._metadata_ids = {}
+        self._extra_rows = {}
+        self._append_metadata(metadatas)
+    
+    def _append_metadata(self, metadatas: List[dict]):
+        """Add one metadata row per chunk, reusing identical dicts"""
+        rows = np.empty(len(metadatas), dtype=np.int32)
+        for i, metadata in enumerate(metadatas):
+            try:
+                key = tuple(sorted(metadata.items()))
+                row = self._metadata_ids.get(key)
+            except TypeError:
+                key, row = None, None
+            if row is None:
+                row = len(self.metadata_table)
+                self.metadata_table.append(metadata)
+                if key is not None:
+                    self._metadata_ids[key] = row
+            rows[i] = row
+        self.metadata_rows = np.concatenate([self.metadata_rows, rows])
+    
+    def search(self, search: str) -> Union[str, Document]:
+        """Rebuild the Document stored under an id"""
+        row = self._extra_rows.get(search)
+        if row is None and search.isdigit() and int(search) < len(self.texts):
+            row = int(search)
+        if row is None:
+            return f"ID {search} not found."
+        metadata = self.metadata_table[self.metadata_rows[row]]
+        return Document(page_content=self.texts[row], metadata=dict(metadata))
+    
+    def add(self, texts: dict) -> None:
+        """Append Documents under arbitrary ids"""
+        for doc_id in texts:
+            if doc_id in self._extra_rows:
+                raise ValueError(f"Tried to add ids that already exist: {doc_id}")
+        for doc_id, doc in texts.items():
+            self._extra_rows[doc_id] = len(self.texts)
+            self.texts.append(doc.page_content)
+        self._append_metadata([doc.metadata for doc in texts.values()])
+
 
 class SentenceTransformerEmbeddings(Embeddings):
     """Wrapper for SentenceTransformer to work with LangChain"""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", batch_size: int = 128,
+                 backend: str = "torch", onnx_file: str = ONNX_QUANTIZED_FILE):
+        self.batch_size = batch_size
+        
+        # Models are loaded and warmed up once per process, then shared
+        key = (model_name, backend, onnx_file if backend == "onnx" else None)
+        if key not in _MODEL_CACHE:
+            model, loaded_backend = self._load_model(model_name, backend, onnx_file)
+            model.encode(["warmup"], show_progress_bar=False)
+            _MODEL_CACHE[key] = (model, loaded_backend)
+        self.model, self.backend = _MODEL_CACHE[key]
+    
+    @staticmethod
+    def _load_model(model_name: str, backend: str, onnx_file: str):
+        """Load a SentenceTransformer, returning (model, backend actually used)"""
+        if backend == "onnx":
+            # int8-quantized ONNX export run by ONNX Runtime; needs
+            # sentence-transformers>=3.2 with the onnx extra
+            try:
+                return SentenceTransformer(model_name, backend="onnx", model_kwargs={"file_name": onnx_file}), "onnx"
+            except Exception as e:
+                logger.warning(f"ONNX backend unavailable ({e}), falling back to torch")
+        
+        model = SentenceTransformer(model_name)
+        
+        # On GPU, run forward passes in half precision
+        if model.device.type == "cuda":
+            model.half()
+        return model, "torch"
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed a list of documents"""
-        embeddings = self.model.encode(texts)
-        return embeddings.tolist()
+        return self.embed_documents_np(texts).tolist()
+    
+    def embed_documents_np(self, texts: List[str]) -> np.ndarray:
+        """Embed a list of documents into a float32 matrix, without Python float lists"""
+        return np.ascontiguousarray(self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        ), dtype=np.float32)
     
     def embed_query(self, text: str) -> List[float]:
         """Embed a single query"""
@@ -72,7 +277,15 @@ class CompanyKnowledgeBase:
                  model_name: str = "all-MiniLM-L6-v2",
                  chunk_size: int = 1000,
                  chunk_overlap: int = 200,
-                 auto_load: bool = True):
+                 auto_load: bool = True,
+                 ivf_min_chunks: int = 5000,
+                 nlist: Optional[int] = None,
+                 pq_m: int = 16,
+                 pq_nbits: int = 8,
+                 nprobe: int = 8,
+                 scalar_quantize: bool = True,
+                 embedding_cache_dir: Optional[str] = ".embeddings_cache",
+                 embedding_backend: str = "torch"):
         """
         Initialize the Knowledge Base processor
         
@@ -82,22 +295,38 @@ class CompanyKnowledgeBase:
             chunk_size: Size of document chunks for processing
             chunk_overlap: Overlap between chunks
             auto_load: Whether to automatically load documents and vector store
+            ivf_min_chunks: Chunk count from which an IVF-PQ index replaces the exact flat index
+            nlist: Number of IVF clusters (defaults to sqrt of the chunk count)
+            pq_m: Number of product-quantizer sub-vectors per embedding
+            pq_nbits: Bits per sub-vector code
+            nprobe: IVF clusters scanned per search
+            scalar_quantize: Store smaller knowledge bases as 8-bit scalar codes instead of float32
+            embedding_cache_dir: Directory for chunk embeddings reused across rebuilds (None disables)
+            embedding_backend: "torch" or "onnx" (int8-quantized, faster on CPU) for sentence transformers
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.ivf_min_chunks = ivf_min_chunks
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.nprobe = nprobe
+        self.scalar_quantize = scalar_quantize
+        self.embedding_cache_dir = embedding_cache_dir
+        self.model_name = model_name
+        self.embedding_backend = embedding_backend
         self.documents = []
         self.vector_store = None
         
+        # Recent query embeddings (unit length) and their search results
+        self._query_vectors = None
+        self._query_results = []
+        
         # Initialize embeddings
         self.embeddings = self._initialize_embeddings(embedding_model, model_name)
         
         # Initialize text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
+        self.text_splitter = _get_text_splitter(chunk_size, chunk_overlap)
         
         # Auto-load documents and vector store if requested
         if auto_load:
@@ -108,28 +337,26 @@ class CompanyKnowledgeBase:
         if embedding_model == "openai":
             if not OPENAI_AVAILABLE:
                 logger.warning("OpenAI not available, falling back to sentence-transformer")
-                return SentenceTransformerEmbeddings(model_name)
+                return SentenceTransformerEmbeddings(model_name, backend=self.embedding_backend)
             
             # Check for OpenAI API key
             if not os.getenv("OPENAI_API_KEY"):
                 logger.warning("OPENAI_API_KEY not set, falling back to sentence-transformer")
-                return SentenceTransformerEmbeddings(model_name)
+                return SentenceTransformerEmbeddings(model_name, backend=self.embedding_backend)
             
             return OpenAIEmbeddings(model=model_name)
         
         else:  # sentence-transformer
-            return SentenceTransformerEmbeddings(model_name)
+            return SentenceTransformerEmbeddings(model_name, backend=self.embedding_backend)
     
     def _auto_initialize(self):
         """Automatically initialize the knowledge base with documents and vector store"""
         # Check for new or changed files
         documents_dir = Path("documents")
-        current_files = set()
         
-        if documents_dir.exists():
-            # Find all supported document files
-            for pattern in ["*.txt", "*.md", "*.pdf", "*.csv"]:
-                current_files.update(documents_dir.glob(pattern))
+        # Find all supported document files with their stat results
+        current_stats = self._scan_documents(documents_dir)
+        current_files = set(current_stats)
         
         # Try to load existing vector store first
         index_path = "company_kb_index"
@@ -147,10 +374,10 @@ class CompanyKnowledgeBase:
                         stored_metadata = json.load(f)
                     
                     # Check for new or modified files
-                    for file_path in current_files:
+                    for file_path, stat in current_stats.items():
                         file_str = str(file_path)
-                        current_mtime = file_path.stat().st_mtime
-                        current_size = file_path.stat().st_size
+                        current_mtime = stat.st_mtime
+                        current_size = stat.st_size
                         
                         if file_str not in stored_metadata:
                             logger.info(f"New file detected: {file_path}")
@@ -176,8 +403,8 @@ class CompanyKnowledgeBase:
                     # No metadata file, use timestamp comparison as fallback
                     logger.info("No metadata file found, checking timestamps...")
                     index_time = Path(index_path).stat().st_mtime
-                    for file_path in current_files:
-                        if file_path.stat().st_mtime > index_time:
+                    for file_path, stat in current_stats.items():
+                        if stat.st_mtime > index_time:
                             logger.info(f"File modified after index: {file_path}")
                             should_rebuild = True
                             break
@@ -219,13 +446,31 @@ class CompanyKnowledgeBase:
         else:
             logger.warning("No supported document files found in documents/ directory")
     
+    @staticmethod
+    def _scan_documents(documents_dir: Path) -> dict:
+        """
+        List supported document files in one directory scan
+        
+        Args:
+            documents_dir: Directory to scan
+            
+        Returns:
+            Dict mapping each file path to its stat result (empty if the directory is missing)
+        """
+        if not documents_dir.exists():
+            return {}
+        with os.scandir(documents_dir) as entries:
+            return {
+                Path(entry.path): entry.stat()
+                for entry in entries
+                if entry.is_file() and entry.name.lower().endswith(SUPPORTED_SUFFIXES)
+            }
+    
     def _load_original_documents(self):
         """Load the original documents for reference"""
         documents_dir = Path("documents")
         if documents_dir.exists():
-            file_paths = []
-            for pattern in ["*.txt", "*.md", "*.pdf", "*.csv"]:
-                file_paths.extend(documents_dir.glob(pattern))
+            file_paths = list(self._scan_documents(documents_dir))
             
             if file_paths:
                 logger.info(f"Loading {len(file_paths)} original documents for reference")
@@ -237,6 +482,8 @@ class CompanyKnowledgeBase:
         """
         Load and extract text from document files
         
+        Files are loaded concurrently; results keep the order of file_paths.
+        
         Args:
             file_paths: List of file paths to load
             
@@ -245,22 +492,53 @@ class CompanyKnowledgeBase:
         """
         documents = []
         
-        for path in file_paths:
-            path = Path(path)
-            
-            if not path.exists():
-                logger.warning(f"File not found: {path}")
-                continue
+        if file_paths:
+            with ThreadPoolExecutor(max_workers=min(8, len(file_paths))) as executor:
+                for docs in executor.map(self._load_file, file_paths):
+                    documents.extend(docs)
+        
+        self.documents = documents
+        return documents
+    
+    def _load_file(self, path: Union[str, Path]) -> List:
+        """
+        Load one document file
+        
+        Args:
+            path: File path to load
             
-            # Check file size (warn about large files)
-            file_size_mb = path.stat().st_size / (1024 * 1024)
-            if file_size_mb > 50:  # Warn about files larger than 50MB
-                logger.warning(f"Large file detected: {path} ({file_size_mb:.1f}MB). Processing may be slow.")
-                # For very large CSV files, only process first part
-                if path.suffix.lower() == ".csv" and file_size_mb > 20:
-                    logger.info(f"Large CSV file detected. Processing first 1000 rows only.")
+        Returns:
+            Documents loaded from the file (empty on any error)
+        """
+        path = Path(path)
+        
+        if not path.exists():
+            logger.warning(f"File not found: {path}")
+            return []
+        
+        # Check file size (warn about large files)
+        file_size_mb = path.stat().st_size / (1024 * 1024)
+        if file_size_mb > 50:  # Warn about files larger than 50MB
+            logger.warning(f"Large file detected: {path} ({file_size_mb:.1f}MB). Processing may be slow.")
+            # For very large CSV files, only process first part
+            if path.suffix.lower() == ".csv" and file_size_mb > 20:
+                logger.info(f"Large CSV file detected. Processing first 1000 rows only.")
+                try:
+                    # Read first 1000 rows of CSV (header included) with the
+                    # C parser, keeping every cell as its original text
+                    text_content = None
                     try:
-                        # Read first 1000 rows of CSV
+                        import pandas as pd
+                    except ImportError:
+                        pd = None
+                    if pd is not None:
+                        try:
+                            df = pd.read_csv(path, nrows=999, dtype=str, keep_default_na=False, encoding='utf-8')
+                            text_content = df.to_csv(index=False)
+                        except pd.errors.ParserError as e:
+                            # Ragged rows stop the C parser but not csv.reader
+                            logger.warning(f"pandas could not parse {path} ({e}); reading it with csv instead")
+                    if text_content is None:
                         import csv
                         with open(path, 'r', encoding='utf-8') as f:
                             reader = csv.reader(f)
@@ -270,43 +548,36 @@ class CompanyKnowledgeBase:
                                 if i >= 999:  # 1000 rows total including header
                                     break
                                 rows.append(row)
-                        
-                        # Convert to text format
-                        text_content = "\\n".join([",".join(row) for row in rows])
-                        
-                        # Create a document object manually
-                        from langchain.schema import Document
-                        doc = Document(page_content=text_content, metadata={"source": str(path)})
-                        documents.append(doc)
-                        logger.info(f"Loaded 1000 rows from large CSV {path}")
-                        continue
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing large CSV {path}: {e}")
-                        continue
-            
-            try:
-                if path.suffix.lower() == ".pdf":
-                    loader = PyPDFLoader(str(path))
-                elif path.suffix.lower() in [".txt", ".md"]:
-                    loader = TextLoader(str(path), encoding='utf-8')
-                elif path.suffix.lower() == ".csv":
-                    # For normal-sized CSV files, use text loader
-                    loader = TextLoader(str(path), encoding='utf-8')
-                else:
-                    logger.warning(f"Unsupported file type: {path.suffix}")
-                    continue
-                
-                docs = loader.load()
-                documents.extend(docs)
-                logger.info(f"Loaded {len(docs)} documents from {path}")
-                
-            except Exception as e:
-                logger.error(f"Error loading {path}: {e}")
-                continue
+                        text_content = "\n".join([",".join(row) for row in rows])
+                    
+                    # Create a document object manually
+                    doc = Document(page_content=text_content, metadata={"source": str(path)})
+                    logger.info(f"Loaded 1000 rows from large CSV {path}")
+                    return [doc]
+                    
+                except Exception as e:
+                    logger.error(f"Error processing large CSV {path}: {e}")
+                    return []
         
-        self.documents = documents
-        return documents
+        try:
+            if path.suffix.lower() == ".pdf":
+                loader = PyPDFLoader(str(path))
+            elif path.suffix.lower() in [".txt", ".md"]:
+                loader = TextLoader(str(path), encoding='utf-8')
+            elif path.suffix.lower() == ".csv":
+                # For normal-sized CSV files, use text loader
+                loader = TextLoader(str(path), encoding='utf-8')
+            else:
+                logger.warning(f"Unsupported file type: {path.suffix}")
+                return []
+            
+            docs = loader.load()
+            logger.info(f"Loaded {len(docs)} documents from {path}")
+            return docs
+            
+        except Exception as e:
+            logger.error(f"Error loading {path}: {e}")
+            return []
     
     def split_documents(self, documents: Optional[List] = None) -> List:
         """
@@ -328,14 +599,21 @@ class CompanyKnowledgeBase:
         all_split_docs = []
         max_chunks_per_file = 200  # Limit chunks per file
         
-        for doc in documents:
-            # Split individual document
-            doc_chunks = self.text_splitter.split_documents([doc])
-            
+        # Split each document, across worker processes for large corpora;
+        # chunks are truncated in the worker to keep the transfer small
+        split_args = ([self.chunk_size] * len(documents), [self.chunk_overlap] * len(documents),
+                      [max_chunks_per_file] * len(documents))
+        total_chars = sum(len(doc.page_content) for doc in documents)
+        if len(documents) > 1 and total_chars >= PARALLEL_SPLIT_MIN_CHARS:
+            with ProcessPoolExecutor() as executor:
+                results = list(executor.map(_split_document, documents, *split_args))
+        else:
+            results = list(map(_split_document, documents, *split_args))
+        
+        for doc, (doc_chunks, total_chunks) in zip(documents, results):
             # Limit chunks if too many
-            if len(doc_chunks) > max_chunks_per_file:
-                logger.warning(f"Document {doc.metadata.get('source', 'unknown')} has {len(doc_chunks)} chunks. Limiting to first {max_chunks_per_file}.")
-                doc_chunks = doc_chunks[:max_chunks_per_file]
+            if total_chunks > max_chunks_per_file:
+                logger.warning(f"Document {doc.metadata.get('source', 'unknown')} has {total_chunks} chunks. Limiting to first {max_chunks_per_file}.")
             
             all_split_docs.extend(doc_chunks)
         
@@ -362,7 +640,31 @@ class CompanyKnowledgeBase:
         
         try:
             logger.info(f"Creating embeddings for {len(split_docs)} document chunks...")
-            self.vector_store = FAISS.from_documents(split_docs, self.embeddings)
+            # Chunk text and metadata go into columns; only the texts are encoded
+            texts = [doc.page_content for doc in split_docs]
+            docstore = ColumnarDocstore(texts, [doc.metadata for doc in split_docs])
+            
+            # Embed and add in batches so only one batch of vectors is held
+            # in memory at a time; the first batch also trains any quantizer
+            batches = self._embed_batches(texts, self._training_size(len(texts)))
+            first_batch = next(batches)
+            index = self._new_index(len(texts), first_batch)
+            index.add(first_batch)
+            added = len(first_batch)
+            del first_batch
+            for vectors in batches:
+                index.add(vectors)
+                added += len(vectors)
+                logger.info(f"Indexed {added}/{len(texts)} chunks")
+            
+            # Wrap the prebuilt index so LangChain never re-embeds the chunks
+            self._clear_query_cache()
+            self.vector_store = FAISS(
+                self.embeddings,
+                index,
+                docstore,
+                {i: str(i) for i in range(len(split_docs))}
+            )
             logger.info("Vector index created successfully")
             return self.vector_store
             
@@ -370,6 +672,167 @@ class CompanyKnowledgeBase:
             logger.error(f"Error creating vector index: {e}")
             return None
     
+    def _embed_batches(self, texts: List[str], first_batch_size: int):
+        """
+        Embed chunk texts batch by batch
+        
+        Unchanged chunks reuse their cached vectors and only new text is
+        encoded. Batches are C-contiguous float32, so FAISS train/add never
+        copy them. The old cache is memory-mapped, and once a chunk misses it
+        each batch is also written straight into a memory-mapped replacement
+        file, so no more than one batch of vectors is held in memory.
+        
+        Args:
+            texts: Chunk texts in docstore order
+            first_batch_size: Size of the first batch (the quantizer training sample)
+            
+        Yields:
+            Embedding matrices for consecutive slices of texts
+        """
+        use_cache = self.embedding_cache_dir is not None
+        cache_keys, cache = self._load_embedding_cache() if use_cache else ({}, None)
+        new_cache, cache_writable, encoded = None, use_cache, 0
+        start, size = 0, first_batch_size
+        
+        try:
+            while start < len(texts):
+                batch = texts[start:start + size]
+                size = INDEX_BATCH_SIZE
+                
+                if not use_cache:
+                    start += len(batch)
+                    yield self._encode_texts(batch)
+                    continue
+                
+                keys = [hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest() for text in batch]
+                missing = [i for i, key in enumerate(keys) if key not in cache_keys]
+                if len(missing) == len(batch):
+                    vectors = self._encode_texts(batch)
+                else:
+                    # Fancy indexing copies the rows out of the mapped cache
+                    vectors = cache["vector"][[cache_keys.get(key, 0) for key in keys]].view(np.ndarray)
+                    if missing:
+                        vectors[missing] = self._encode_texts([batch[i] for i in missing])
+                
+                if missing and new_cache is None and cache_writable:
+                    try:
+                        new_cache = self._open_embedding_cache(len(texts), vectors.shape[1])
+                    except OSError as e:
+                        logger.warning(f"Could not save embedding cache: {e}")
+                        cache_writable = False
+                    else:
+                        # First miss: every earlier chunk was a hit, so copy those rows over
+                        for offset in range(0, start, INDEX_BATCH_SIZE):
+                            earlier = texts[offset:min(offset + INDEX_BATCH_SIZE, start)]
+                            rows = [cache_keys[hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()] for text in earlier]
+                            new_cache[offset:offset + len(earlier)] = cache[rows]
+                if new_cache is not None:
+                    new_cache["key"][start:start + len(batch)] = np.frombuffer(b"".join(keys), dtype="V16")
+                    new_cache["vector"][start:start + len(batch)] = vectors
+                
+                encoded += len(missing)
+                start += len(batch)
+                yield vectors
+            
+            if use_cache:
+                logger.info(f"Reused {len(texts) - encoded} cached embeddings, encoded {encoded}")
+                if new_cache is not None:
+                    new_cache.flush()
+                    tmp_path, new_cache, cache = new_cache.filename, None, None
+                    self._commit_embedding_cache(tmp_path)
+        finally:
+            if new_cache is not None:
+                # Abandoned part-way; the old cache stays in place
+                tmp_path, new_cache = new_cache.filename, None
+                Path(tmp_path).unlink(missing_ok=True)
+    
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Encode texts with the embedding model into a float32 matrix"""
+        if hasattr(self.embeddings, "embed_documents_np"):
+            return self.embeddings.embed_documents_np(texts)
+        return np.ascontiguousarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+    
+    def _embedding_cache_path(self) -> Path:
+        """Cache file for the current embedding model and backend"""
+        name = self.model_name.replace('/', '_')
+        backend = getattr(self.embeddings, "backend", "torch")
+        if backend != "torch":
+            name = f"{name}-{backend}"
+        return Path(self.embedding_cache_dir) / f"{name}.npy"
+    
+    def _load_embedding_cache(self):
+        """
+        Memory-map the cached chunk embeddings
+        
+        Returns:
+            Tuple of (content hash -> row number, record array of "key" and
+            "vector" fields); empty if no cache exists
+        """
+        try:
+            cache = np.load(self._embedding_cache_path(), mmap_mode="r", allow_pickle=False)
+            return {key.tobytes(): row for row, key in enumerate(cache["key"])}, cache
+        except Exception:
+            return {}, None
+    
+    def _open_embedding_cache(self, n_rows: int, dim: int) -> np.memmap:
+        """Memory-mapped temp file for a replacement cache of n_rows embeddings"""
+        path = self._embedding_cache_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        dtype = np.dtype([("key", "V16"), ("vector", np.float32, (dim,))])
+        return np.lib.format.open_memmap(path.with_suffix(".tmp"), mode="w+", dtype=dtype, shape=(n_rows,))
+    
+    def _commit_embedding_cache(self, tmp_path: str):
+        """Replace the cache with a fully written replacement file"""
+        try:
+            os.replace(tmp_path, self._embedding_cache_path())
+        except OSError as e:
+            logger.warning(f"Could not save embedding cache: {e}")
+    
+    def _nlist(self, n_chunks: int) -> int:
+        """Number of IVF clusters for a knowledge base of n_chunks"""
+        return self.nlist or max(1, int(np.sqrt(n_chunks)))
+    
+    def _training_size(self, n_chunks: int) -> int:
+        """Vectors to embed before the index is created, enough to train IVF-PQ"""
+        if n_chunks >= self.ivf_min_chunks:
+            return max(INDEX_BATCH_SIZE,
+                       IVF_TRAINING_POINTS_PER_LIST * self._nlist(n_chunks),
+                       IVF_TRAINING_POINTS_PER_LIST * (1 << self.pq_nbits))
+        return INDEX_BATCH_SIZE
+    
+    def _new_index(self, n_chunks: int, sample: np.ndarray):
+        """
+        Create an empty FAISS index for n_chunks vectors, trained on sample
+        
+        Large knowledge bases get IVF-PQ, smaller ones 8-bit scalar codes
+        (queries stay float32) unless exact flat storage is requested.
+        
+        Args:
+            n_chunks: Number of vectors that will be added
+            sample: First embeddings, used to train quantizers
+            
+        Returns:
+            FAISS index ready for add
+        """
+        dim = sample.shape[1]
+        if n_chunks >= self.ivf_min_chunks:
+            index = faiss.index_factory(dim, f"IVF{self._nlist(n_chunks)},PQ{self.pq_m}x{self.pq_nbits}", faiss.METRIC_L2)
+            index.train(sample)
+            self._set_nprobe(index)
+            logger.info(f"Compressing {n_chunks} vectors into an IVF-PQ index")
+        elif self.scalar_quantize:
+            index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+            index.train(sample)
+            logger.info(f"Storing {n_chunks} vectors as 8-bit scalar codes")
+        else:
+            index = faiss.IndexFlatL2(dim)
+        return index
+    
+    def _set_nprobe(self, index):
+        """Apply the configured nprobe to IVF indexes; flat indexes are left alone"""
+        if hasattr(index, "nprobe"):
+            index.nprobe = self.nprobe
+    
     def save_index(self, index_path: str = "company_kb_index"):
         """
         Save the vector index to disk along with metadata about indexed documents
@@ -394,13 +857,13 @@ class CompanyKnowledgeBase:
                 from datetime import datetime
                 
                 file_info = {}
-                for pattern in ["*.txt", "*.md", "*.pdf", "*.csv"]:
-                    for file_path in documents_dir.glob(pattern):
-                        file_info[str(file_path)] = {
-                            "size": file_path.stat().st_size,
-                            "mtime": file_path.stat().st_mtime,
-                            "indexed_at": datetime.now().isoformat()
-                        }
+                indexed_at = datetime.now().isoformat()
+                for file_path, stat in self._scan_documents(documents_dir).items():
+                    file_info[str(file_path)] = {
+                        "size": stat.st_size,
+                        "mtime": stat.st_mtime,
+                        "indexed_at": indexed_at
+                    }
                 
                 with open(metadata_path, 'w') as f:
                     json.dump(file_info, f, indent=2)
@@ -414,25 +877,56 @@ class CompanyKnowledgeBase:
             logger.error(f"Error saving index: {e}")
             return False
     
-    def load_index(self, index_path: str = "company_kb_index"):
+    def load_index(self, index_path: str = "company_kb_index", mmap: bool = True):
         """
         Load a vector index from disk
         
         Args:
             index_path: Path to load the index from
+            mmap: Page the FAISS index in from disk on demand instead of copying it into memory
         """
         try:
-            self.vector_store = FAISS.load_local(
-                index_path, 
-                self.embeddings,
-                allow_dangerous_deserialization=True
-            )
+            self.vector_store = self._load_mmap_index(index_path) if mmap else None
+            if self.vector_store is None:
+                self.vector_store = FAISS.load_local(
+                    index_path, 
+                    self.embeddings,
+                    allow_dangerous_deserialization=True
+                )
+            self._set_nprobe(self.vector_store.index)
+            self._clear_query_cache()
             logger.info(f"Vector index loaded from {index_path}")
             return True
         except Exception as e:
             logger.error(f"Error loading index: {e}")
             return False
     
+    def _load_mmap_index(self, index_path: str) -> Optional[FAISS]:
+        """
+        Load a saved vector store with its FAISS index memory-mapped read-only
+        
+        Reads the same index.faiss/index.pkl pair that FAISS.save_local writes.
+        
+        Args:
+            index_path: Path to load the index from
+            
+        Returns:
+            FAISS vector store, or None if this index type cannot be mapped
+        """
+        try:
+            index = faiss.read_index(
+                os.path.join(index_path, "index.faiss"),
+                faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+            )
+        except RuntimeError as e:
+            logger.info(f"Index cannot be memory-mapped ({e}), loading it into memory")
+            return None
+        
+        import pickle
+        with open(os.path.join(index_path, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+    
     def search_similar(self, query: str, k: int = 5) -> List:
         """
         Search for similar documents
@@ -449,13 +943,71 @@ class CompanyKnowledgeBase:
             return []
         
         try:
-            results = self.vector_store.similarity_search(query, k=k)
+            query_vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+            unit_vector = query_vector / (np.linalg.norm(query_vector) or 1.0)
+            
+            # A near-identical recent query with at least k results answers this one
+            if self._query_vectors is not None:
+                sims = self._query_vectors @ unit_vector
+                best = int(np.argmax(sims))
+                cached_k, cached_results = self._query_results[best]
+                if sims[best] >= QUERY_CACHE_SIMILARITY and cached_k >= k:
+                    logger.info(f"Reused cached results for query: '{query[:50]}...'")
+                    return cached_results[:k]
+            
+            results = self.vector_store.similarity_search_by_vector(query_vector.tolist(), k=k)
+            self._remember_query(unit_vector, k, results)
             logger.info(f"Found {len(results)} similar documents for query: '{query[:50]}...'")
             return results
         except Exception as e:
             logger.error(f"Error searching: {e}")
             return []
     
+    def _remember_query(self, unit_vector: np.ndarray, k: int, results: List):
+        """Add a query's results to the cache, dropping the oldest beyond QUERY_CACHE_SIZE"""
+        if self._query_vectors is None:
+            self._query_vectors = unit_vector[None, :]
+        else:
+            self._query_vectors = np.vstack([self._query_vectors, unit_vector])[-QUERY_CACHE_SIZE:]
+        self._query_results = (self._query_results + [(k, results)])[-QUERY_CACHE_SIZE:]
+    
+    def _clear_query_cache(self):
+        """Forget cached query results; called whenever the index changes"""
+        self._query_vectors = None
+        self._query_results = []
+    
+    def search_similar_batch(self, queries: List[str], k: int = 5) -> List[List]:
+        """
+        Search for similar documents for several queries at once
+        
+        All queries are embedded together and searched in one FAISS call,
+        which parallelizes over the queries.
+        
+        Args:
+            queries: Search queries
+            k: Number of results to return per query
+            
+        Returns:
+            List of similar-document lists, one per query
+        """
+        if self.vector_store is None:
+            logger.error("No vector store available for search")
+            return [[] for _ in queries]
+        
+        if not queries:
+            return []
+        
+        try:
+            _, ids = self.vector_store.index.search(self._encode_texts(queries), k)
+            docstore = self.vector_store.docstore
+            id_map = self.vector_store.index_to_docstore_id
+            results = [[docstore.search(id_map[i]) for i in row if i != -1] for row in ids]
+            logger.info(f"Found similar documents for {len(queries)} queries")
+            return results
+        except Exception as e:
+            logger.error(f"Error searching: {e}")
+            return [[] for _ in queries]
+    
     def search_with_scores(self, query: str, k: int = 5) -> List:
         """
         Search for similar documents with similarity scores
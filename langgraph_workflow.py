@@ -11,13 +11,23 @@ This module handles the conditional routing workflow that:
 Professional separation of concerns for enterprise-grade customer service automation.
 """
 
+import atexit
 import json
 import os
+import queue
+import threading
 from datetime import datetime
 from typing import Dict, Any, Optional, List, TypedDict
 from langgraph.graph import StateGraph, END
 from dotenv import load_dotenv
 
+# Optional: faster JSON for workflow log lines (falls back to the stdlib json module)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Import prototype agents for routing
 try:
     from amazon_prototype_agent import AmazonCustomerServiceAgent
@@ -65,20 +75,49 @@ def get_timestamped_filename(prefix: str, extension: str, folder: str) -> str:
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     return os.path.join(folder, f"{prefix}_{timestamp}.{extension}")
 
+# Workflow log lines (encoded JSON) are appended by a background thread, which writes
+# everything queued since its last wake-up in a single call
+WORKFLOW_LOG_FILE = os.path.join("workflow_logs", "routing_workflow.log")
+_log_queue = queue.Queue()
+
+def _workflow_log_writer():
+    """Drain queued log lines and append each batch to the workflow log"""
+    while True:
+        lines = [_log_queue.get()]
+        while True:
+            try:
+                lines.append(_log_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            ensure_folders_exist()
+            with open(WORKFLOW_LOG_FILE, 'ab') as f:
+                f.write(b"".join(lines))
+        except OSError as e:
+            print(f"⚠️ Could not write workflow log: {e}")
+        finally:
+            for _ in lines:
+                _log_queue.task_done()
+
+threading.Thread(target=_workflow_log_writer, daemon=True, name="workflow-log").start()
+atexit.register(_log_queue.join)
+
 def save_workflow_log(state: WorkflowState, stage: str, message: str):
-    """Save workflow progress to log file"""
-    ensure_folders_exist()
+    """Queue a workflow progress entry for the log file"""
     log_entry = {
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": datetime.now(),
         "stage": stage,
         "message": message,
         "detected_company": state.get("detected_company"),
         "workflow_status": state.get("workflow_status")
     }
     
-    log_file = os.path.join("workflow_logs", "routing_workflow.log")
-    with open(log_file, 'a', encoding='utf-8') as f:
-        f.write(json.dumps(log_entry) + "\n")
+    # orjson writes the datetime in ISO format itself
+    if ORJSON_AVAILABLE:
+        _log_queue.put(orjson.dumps(log_entry, option=orjson.OPT_APPEND_NEWLINE))
+    else:
+        log_entry["timestamp"] = log_entry["timestamp"].isoformat()
+        _log_queue.put((json.dumps(log_entry) + "\n").encode('utf-8'))
 
 # ====================================
 # WORKFLOW NODES
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the columnar docstore in knowledge_base
+"""
+
+import os
+import sys
+
+import pytest
+
+# knowledge_base imports its whole retrieval stack at module level
+for module in ("numpy", "faiss", "langchain", "langchain_community", "sentence_transformers"):
+    pytest.importorskip(module)
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from langchain.schema import Document
+from knowledge_base import ColumnarDocstore
+
+
+def make_docstore():
+    return ColumnarDocstore(
+        ["first chunk", "second chunk", "third chunk"],
+        [{"source": "a.txt", "page": 0}, {"page": 0, "source": "a.txt"}, {"source": "b.txt"}]
+    )
+
+
+def test_rows_are_addressed_by_their_number():
+    docstore = make_docstore()
+    doc = docstore.search("1")
+    assert isinstance(doc, Document)
+    assert doc.page_content == "second chunk"
+    assert doc.metadata == {"source": "a.txt", "page": 0}
+
+
+def test_unknown_ids_are_reported_not_raised():
+    docstore = make_docstore()
+    assert docstore.search("3") == "ID 3 not found."
+    assert docstore.search("missing") == "ID missing not found."
+
+
+def test_identical_metadata_is_stored_once():
+    docstore = make_docstore()
+    assert len(docstore.metadata_table) == 2
+    assert docstore.metadata_rows.tolist() == [0, 0, 1]
+
+
+def test_returned_metadata_is_a_copy():
+    docstore = make_docstore()
+    docstore.search("0").metadata["source"] = "changed"
+    assert docstore.search("1").metadata["source"] == "a.txt"
+
+
+def test_unhashable_metadata_gets_its_own_row():
+    docstore = ColumnarDocstore(["x", "y"], [{"tags": ["a"]}, {"tags": ["a"]}])
+    assert docstore.metadata_rows.tolist() == [0, 1]
+    assert docstore.search("1").metadata == {"tags": ["a"]}
+
+
+def test_added_documents_are_found_by_their_ids():
+    docstore = make_docstore()
+    docstore.add({
+        "extra-1": Document(page_content="added chunk", metadata={"source": "b.txt"}),
+        "extra-2": Document(page_content="another chunk", metadata={"source": "c.txt"}),
+    })
+    assert docstore.search("extra-1").page_content == "added chunk"
+    assert docstore.search("extra-2").metadata == {"source": "c.txt"}
+    assert len(docstore.metadata_table) == 3
+    assert docstore.search("2").page_content == "third chunk"
+
+
+def test_adding_an_existing_id_fails_without_changes():
+    docstore = make_docstore()
+    docstore.add({"extra": Document(page_content="added chunk", metadata={})})
+    with pytest.raises(ValueError):
+        docstore.add({
+            "new": Document(page_content="new chunk", metadata={}),
+            "extra": Document(page_content="duplicate", metadata={}),
+        })
+    assert docstore.search("new") == "ID new not found."
+    assert len(docstore.texts) == 4
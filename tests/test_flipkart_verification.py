@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the rule-based verification fast path in flipkart_prototype_agent
+"""
+
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("groq")
+pytest.importorskip("dotenv")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flipkart_prototype_agent import match_verification_info
+
+
+def test_customer_id_is_found_and_uppercased():
+    assert match_verification_info("my id is fkt001234567 thanks") == {
+        "customer_id": "FKT001234567",
+        "phone": None
+    }
+
+
+@pytest.mark.parametrize("text,phone", [
+    ("call me on 9876543210", "9876543210"),
+    ("number +91 98765 43210 please", "+91 98765 43210"),
+    ("it is 91-9876543210", "91-9876543210"),
+])
+def test_indian_mobile_numbers_are_found(text, phone):
+    assert match_verification_info(text) == {"customer_id": None, "phone": phone}
+
+
+def test_id_and_phone_together():
+    info = match_verification_info("FKT001234567, 9876543210")
+    assert info == {"customer_id": "FKT001234567", "phone": "9876543210"}
+
+
+@pytest.mark.parametrize("text", [
+    "I don't remember my details",
+    "order 1234567890",
+    "FKT12345",
+    "",
+])
+def test_no_match_defers_to_the_llm(text):
+    assert match_verification_info(text) is None
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the pure helpers in intelligent_solution_agent
+"""
+
+import importlib.util
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import intelligent_solution_agent as agent
+
+
+@pytest.fixture(params=["automaton", "regex"])
+def scanner(request, monkeypatch):
+    """The agent module with the Aho-Corasick keyword scan, then with the regex fallback"""
+    if request.param == "automaton":
+        pytest.importorskip("ahocorasick")
+        return agent
+    monkeypatch.setitem(sys.modules, "ahocorasick", None)
+    spec = importlib.util.spec_from_file_location("_solution_agent_regex", agent.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert not module.AHOCORASICK_AVAILABLE
+    return module
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable stand-in for time.monotonic"""
+    now = [1000.0]
+    monkeypatch.setattr(agent.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_lru_cache_returns_stored_values():
+    cache = agent.LRUCache(max_entries=2, ttl=60)
+    assert cache.get("missing") is None
+    cache.put("a", "1")
+    assert cache.get("a") == "1"
+    cache.put("a", "2")
+    assert cache.get("a") == "2"
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = agent.LRUCache(max_entries=2, ttl=60)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_lru_cache_entries_expire_after_ttl(clock):
+    cache = agent.LRUCache(max_entries=2, ttl=60)
+    cache.put("a", "1")
+    clock[0] += 60
+    assert cache.get("a") == "1"
+    clock[0] += 1
+    assert cache.get("a") is None
+    assert "a" not in cache._entries
+
+
+def test_adaptive_batch_size_grows_while_latency_is_flat():
+    batch = agent.AdaptiveBatchSize(size=4, max_size=6)
+    for latency in (1.0, 1.05, 1.1, 1.1, 1.1):
+        batch.record(latency)
+    assert batch.size == 6
+
+
+def test_adaptive_batch_size_halves_on_spike_and_holds_in_between():
+    batch = agent.AdaptiveBatchSize(size=8, max_size=32)
+    batch.record(1.0)
+    assert batch.size == 9
+    batch.record(1.3)
+    assert batch.size == 9
+    batch.record(2.0)
+    assert batch.size == 4
+    for latency in (4.0, 8.0, 16.0, 32.0):
+        batch.record(latency)
+    assert batch.size == 1
+
+
+def test_adaptive_batch_size_clamps_start_size():
+    assert agent.AdaptiveBatchSize(size=0).size == 1
+    assert agent.AdaptiveBatchSize(size=100, max_size=32).size == 32
+
+
+def test_adaptive_batch_size_hint_round_trip(tmp_path):
+    hint = tmp_path / "hint"
+    assert agent.AdaptiveBatchSize.from_hint(str(hint)).size == agent.BATCH_START_SIZE
+    batch = agent.AdaptiveBatchSize(size=12)
+    batch.save_hint(str(hint))
+    assert agent.AdaptiveBatchSize.from_hint(str(hint)).size == 12
+    hint.write_text("not a number")
+    assert agent.AdaptiveBatchSize.from_hint(str(hint)).size == agent.BATCH_START_SIZE
+
+
+def test_category_keywords_are_counted_per_category(scanner):
+    hits = scanner.scan_category_keywords("My REFUND for the returned item is delayed", "amazon")
+    assert hits == {"refunds_returns": 2, "shipping_delays": 1}
+    assert scanner.scan_category_keywords("Two payments on my cards", "amazon") == {"payment_issues": 2}
+    assert scanner.scan_category_keywords("My posts were removed", "facebook") == {"content_moderation": 2}
+
+
+@pytest.mark.parametrize("company,text", [
+    ("amazon", "I will check later for the latest news"),
+    ("amazon", "It came in a cardboard box"),
+    ("amazon", "The chocolate plate arrived"),
+    ("facebook", "The meeting was postponed"),
+    ("facebook", "Nothing relevant here"),
+])
+def test_category_keywords_match_whole_words_only(scanner, company, text):
+    assert not scanner.scan_category_keywords(text, company)
+
+
+@pytest.mark.parametrize("text,labels", [
+    ("I will sue you and call my LAWYER", {"legal"}),
+    ("There is an issue with my order", set()),
+    ("I was hurt and went to the hospital", {"safety"}),
+    ("It was expensive, over $1000", {"high_value"}),
+    ("My attorney says the heater is unsafe and cost $5000", {"legal", "safety", "high_value"}),
+])
+def test_escalation_keywords(scanner, text, labels):
+    assert scanner.scan_escalation_keywords(text) == labels
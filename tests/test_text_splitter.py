@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the single-pass chunk splitter in knowledge_base
+"""
+
+import os
+import random
+import string
+import sys
+
+import pytest
+
+# knowledge_base imports its whole retrieval stack at module level
+for module in ("numpy", "faiss", "langchain", "langchain_community", "sentence_transformers"):
+    pytest.importorskip(module)
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from knowledge_base import SinglePassTextSplitter
+
+
+def make_splitter(chunk_size, chunk_overlap):
+    return SinglePassTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""]
+    )
+
+
+def random_words(n_words, seed=0):
+    """Unrepeated prose-like text with paragraph, line and word breaks"""
+    rng = random.Random(seed)
+    parts = []
+    for i in range(n_words):
+        parts.append("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 12))))
+        parts.append(rng.choice(["\n\n", "\n"]) if i % 17 == 16 else " ")
+    return "".join(parts)
+
+
+def chunk_spans(text, chunks):
+    """(start, end) of each chunk in text, searching forward from the previous chunk"""
+    spans = []
+    position = 0
+    for chunk in chunks:
+        start = text.find(chunk, position)
+        assert start != -1, f"chunk is not a slice of the text: {chunk!r}"
+        spans.append((start, start + len(chunk)))
+        position = start + 1
+    return spans
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(100, 0), (100, 20), (250, 50), (64, 32)])
+def test_chunks_respect_size_and_cover_text(chunk_size, chunk_overlap):
+    text = random_words(2000)
+    chunks = make_splitter(chunk_size, chunk_overlap).split_text(text)
+
+    assert chunks
+    assert all(0 < len(chunk) <= chunk_size for chunk in chunks)
+
+    covered = bytearray(len(text))
+    for start, end in chunk_spans(text, chunks):
+        covered[start:end] = b"\x01" * (end - start)
+    assert all(covered[i] for i, char in enumerate(text) if not char.isspace())
+
+
+def test_word_chunks_overlap_at_word_boundaries():
+    text = random_words(2000)
+    chunks = make_splitter(200, 40).split_text(text)
+    spans = chunk_spans(text, chunks)
+
+    shared = [previous[1] - current[0] for previous, current in zip(spans, spans[1:])]
+    assert all(0 < overlap <= 40 for overlap in shared)
+    for chunk in chunks[1:]:
+        start = text.find(chunk)
+        assert start == 0 or text[start - 1].isspace()
+
+
+def test_hard_cuts_back_up_by_the_overlap():
+    rng = random.Random(1)
+    text = "".join(rng.choice(string.ascii_letters) for _ in range(1000))
+    chunks = make_splitter(100, 20).split_text(text)
+
+    assert all(len(chunk) == 100 for chunk in chunks[:-1])
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous[-20:] == current[:20]
+    assert chunks[-1] == text[-len(chunks[-1]):]
+
+
+def test_overlap_equal_to_chunk_size_still_progresses():
+    text = "x" * 50
+    chunks = make_splitter(10, 10).split_text(text)
+
+    assert chunks
+    assert all(len(chunk) <= 10 for chunk in chunks)
+    assert len(chunks) <= len(text)
+
+
+def test_short_and_blank_texts():
+    splitter = make_splitter(100, 20)
+    assert splitter.split_text("") == []
+    assert splitter.split_text("   \n\n  ") == []
+    assert splitter.split_text("  one short chunk  ") == ["one short chunk"]
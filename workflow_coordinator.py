@@ -20,13 +20,14 @@ from dotenv import load_dotenv
 try:
     from conversational_agent_simplified import start_conversation_session, TTSManager
     from langgraph_workflow import execute_routing_workflow
-    from intelligent_solution_agent import IntelligentSolutionAgent
+    from intelligent_solution_agent import IntelligentSolutionAgent, get_agent as get_solution_agent
     print("✅ Workflow modules imported successfully")
 except ImportError as e:
     print(f"❌ Error importing workflow modules: {e}")
     start_conversation_session = None
     execute_routing_workflow = None
     IntelligentSolutionAgent = None
+    get_solution_agent = None
 
 # Load environment variables
 load_dotenv()
@@ -190,8 +191,8 @@ class CustomerServiceWorkflowCoordinator:
                     solution_result = {"status": "skipped", "reason": "Solution agent not available"}
                 else:
                     try:
-                        # Initialize solution agent
-                        solution_agent = IntelligentSolutionAgent()
+                        # Reuse the process-wide solution agent
+                        solution_agent = get_solution_agent()
                         
                         # Process the prototype output file
                         solution_result = solution_agent.process_customer_issue(prototype_file)
@@ -409,7 +410,7 @@ def demo_workflow_with_mock_data():
             if IntelligentSolutionAgent and prototype_file:
                 print("\\n🤖 Executing intelligent solution agent...")
                 try:
-                    solution_agent = IntelligentSolutionAgent()
+                    solution_agent = get_solution_agent()
                     solution_result = solution_agent.process_customer_issue(prototype_file)
                     
                     if "error" not in solution_result: